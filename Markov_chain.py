@@ -1,52 +1,179 @@
+import math
 import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Tuple
+import numpy as np
 class Markov_chain:
     def __init__(self, edges:List[Tuple[str, str, float]]):
-        self._states=self._add_states(edges)
-        self._P=self._build_P(edges, self._states)
-    def _add_states(self, edges):
-        states=set()
+        self._states, self._index, self._indptr, self._indices, self._probs = self._build_P(edges)
+        self._np = None
+        self._alias = None
+    def _build_P(self, edges):
+        index = {}
+        rows = []
         for state_0, state_1, cpd in edges:
-            states.update([state_0,state_1])
-        return list(states)
-    def _build_P(self, edges, states):
-        P = [[0] * len(states) for _ in range(len(states))]
-        for state in states:
-            if sum([cpd for state_0, _, cpd in edges if state_0 == state]) != 1:
-                raise ValueError(f"This state lacks data or data redundancy: {state}")
-            if any(not (0<cpd<=1) for state_0, state_1, cpd in edges if state_0 == state):
+            if not (0 < cpd <= 1):
                 raise ValueError(f"Out of range (0, 1] : ({state_0}, {state_1}, {cpd})")
-        for state_0, state_1, cpd in edges:
-            P[states.index(state_0)][states.index(state_1)] = cpd
-        return P
+            idx_0 = index.setdefault(state_0, len(index))
+            idx_1 = index.setdefault(state_1, len(index))
+            while len(rows) < len(index):
+                rows.append({})
+            rows[idx_0][idx_1] = rows[idx_0].get(idx_1, 0) + cpd
+        states = list(index)
+        indptr = array('q', [0])
+        indices = array('q')
+        probs = array('d')
+        for idx, row in enumerate(rows):
+            if not math.isclose(math.fsum(row.values()), 1, rel_tol=1e-9, abs_tol=1e-12):
+                raise ValueError(f"This state lacks data or data redundancy: {states[idx]}")
+            indices.extend(row.keys())
+            probs.extend(row.values())
+            indptr.append(len(indices))
+        return states, index, indptr, indices, probs
+    def _build_alias(self):
+        if self._alias is None:
+            accept = array('d', bytes(8 * len(self._probs)))
+            alias = array('q', self._indices)
+            for idx in range(len(self._states)):
+                start, end = self._indptr[idx], self._indptr[idx + 1]
+                scaled = [prob * (end - start) for prob in self._probs[start:end]]
+                small = [k for k, prob in enumerate(scaled) if prob < 1]
+                large = [k for k, prob in enumerate(scaled) if prob >= 1]
+                while small and large:
+                    k_s, k_l = small.pop(), large.pop()
+                    accept[start + k_s] = scaled[k_s]
+                    alias[start + k_s] = self._indices[start + k_l]
+                    scaled[k_l] += scaled[k_s] - 1
+                    (small if scaled[k_l] < 1 else large).append(k_l)
+                for k in small + large:
+                    accept[start + k] = 1
+            self._alias = (accept, alias)
+        return self._alias
     def random_walk(self, state:str, time:int):
-        if state not in self._states:
+        if state not in self._index:
             raise ValueError(f"Not in the graph : {state}")
         if time <= 0:
             raise ValueError("Meaningless parameters")
-        num=len(self._states)
-        current = state
+        accept, alias = self._build_alias()
+        indptr, indices = self._indptr, self._indices
+        current = self._index[state]
         path = []
         for _ in range(time):
-            idx_0 = self._states.index(current)
-            idxs = []
-            probs = []
-            for idx, prob in zip(range(num), self._P[idx_0]):
-                if prob != 0:
-                    idxs.append(idx)
-                    probs.append(prob)
-            if not probs:
-                break
-            idx_1 = random.choices(idxs, probs)[0]
-            path.append(self._states[idx_1])
-            current = path[-1]
+            start = indptr[current]
+            j = start + int(random.random() * (indptr[current + 1] - start))
+            current = indices[j] if random.random() < accept[j] else alias[j]
+            path.append(self._states[current])
         return path
-    def predict(self, state:str, time:int):
-        if state not in self._states:
-            raise ValueError(f"Not in the graph : {state}")
+    @staticmethod
+    def _walks(indptr, indices, accept, alias, starts, time:int, seed):
+        rng = np.random.default_rng(seed)
+        paths = np.empty((len(starts), time), dtype=np.int64)
+        current = starts
+        for t in range(time):
+            start = indptr[current]
+            j = start + (rng.random(len(current)) * (indptr[current + 1] - start)).astype(np.int64)
+            current = np.where(rng.random(len(current)) < accept[j], indices[j], alias[j])
+            paths[:, t] = current
+        return paths
+    def random_walks(self, state, time:int, walks:int=1, seed=None, processes:int=0, labels:bool=False):
+        if time <= 0 or walks <= 0:
+            raise ValueError("Meaningless parameters")
+        states = [state] * walks if self._single(state) else state
+        for s in states:
+            if s not in self._index:
+                raise ValueError(f"Not in the graph : {s}")
+        starts = np.fromiter((self._index[s] for s in states), dtype=np.int64, count=len(states))
+        accept, alias = self._build_alias()
+        arrays = (
+            np.frombuffer(self._indptr, dtype=np.int64),
+            np.frombuffer(self._indices, dtype=np.int64),
+            np.frombuffer(accept, dtype=np.float64),
+            np.frombuffer(alias, dtype=np.int64)
+        )
+        if processes > 1:
+            seeds = np.random.SeedSequence(seed).spawn(processes)
+            with ProcessPoolExecutor(processes) as executor:
+                futures = [
+                    executor.submit(Markov_chain._walks, *arrays, chunk, time, chunk_seed)
+                    for chunk, chunk_seed in zip(np.array_split(starts, processes), seeds)
+                ]
+                paths = np.concatenate([future.result() for future in futures])
+        else:
+            paths = Markov_chain._walks(*arrays, starts, time, seed)
+        return np.array(self._states, dtype=object)[paths] if labels else paths
+    def _arrays(self):
+        if self._np is None:
+            indptr = np.frombuffer(self._indptr, dtype=np.int64)
+            self._np = (
+                np.repeat(np.arange(len(self._states)), np.diff(indptr)),
+                np.frombuffer(self._indices, dtype=np.int64),
+                np.frombuffer(self._probs, dtype=np.float64)
+            )
+        return self._np
+    def _dense(self):
+        rows, cols, probs = self._arrays()
+        P = np.zeros((len(self._states), len(self._states)))
+        np.add.at(P, (rows, cols), probs)
+        return P
+    def _step(self, V, block_size:int=1 << 15):
+        rows, cols, probs = self._arrays()
+        num = len(self._states)
+        block = block_size // max(len(cols), 1)
+        if block <= 1 or len(V) == 1:
+            return np.stack([np.bincount(cols, weights=v[rows] * probs, minlength=num) for v in V])
+        index = (np.arange(block)[:, None] * num + cols).ravel()
+        V_1 = np.empty((len(V), num))
+        for start in range(0, len(V), block):
+            W = V[start:start + block]
+            V_1[start:start + len(W)] = np.bincount(index[:len(W) * len(cols)], weights=(W.take(rows, axis=1) * probs).ravel(), minlength=len(W) * num).reshape(len(W), num)
+        return V_1
+    def _vectors(self, state):
+        if isinstance(state, (list, tuple)) and any(isinstance(s, np.ndarray) for s in state):
+            try:
+                return np.array(state, dtype=np.float64)
+            except (TypeError, ValueError):
+                raise ValueError("Meaningless parameters") from None
+        return state
+    def _single(self, state):
+        return not isinstance(state, (list, tuple, np.ndarray)) or isinstance(state, tuple) and state in self._index
+    def _distribution(self, state):
+        if isinstance(state, np.ndarray):
+            V = np.array(state, dtype=np.float64, ndmin=2)
+            if V.ndim != 2 or V.shape[1] != len(self._states) or not np.allclose(V.sum(axis=1), 1):
+                raise ValueError("Meaningless parameters")
+            return V
+        states = [state] if self._single(state) else state
+        V = np.zeros((len(states), len(self._states)))
+        for i, s in enumerate(states):
+            try:
+                V[i, self._index[s]] = 1
+            except (KeyError, TypeError):
+                raise ValueError(f"Not in the graph : {s}") from None
+        return V
+    def predict(self, state, time:int, tol:float=0.0, dense_limit:int=2048):
+        state = self._vectors(state)
+        V = self._distribution(state)
         if time <= 0:
             raise ValueError("Meaningless parameters")
-        v_0 = [(0 if idx != self._states.index(state) else 1) for i in range(len(self._P))]
-        P_n = Matrix_Operations._pow(self._P, time)
-        v_1 = [sum(v_0[i]*P_n[i][j] for i in range(len(P))) for j in range(len(P))]
-        return v_1
\ No newline at end of file
+        num = len(self._states)
+        if num <= dense_limit and num ** 3 * math.log2(time) < len(V) * time * len(self._arrays()[1]):
+            V = V @ np.linalg.matrix_power(self._dense(), time)
+            V /= V.sum(axis=1, keepdims=True)
+        else:
+            for _ in range(time):
+                V_1 = self._step(V)
+                converged = tol and np.abs(V_1 - V).max() <= tol
+                V = V_1
+                if converged:
+                    break
+        return V[0] if self._single(state) or isinstance(state, np.ndarray) and state.ndim == 1 else V
+    def stationary_distribution(self, tol:float=1e-12, max_iter:int=100000, start=None):
+        num = len(self._states)
+        v = np.full((1, num), 1 / num) if start is None else self._distribution(self._vectors(start))[:1]
+        for _ in range(max_iter):
+            v_1 = (v + self._step(v)) / 2
+            if np.abs(v_1 - v).sum() <= tol:
+                return v_1[0] / v_1.sum()
+            v = v_1
+        raise ValueError(f"Power iteration did not converge within {max_iter} iterations")
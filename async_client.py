@@ -0,0 +1,142 @@
+import asyncio
+from codec import BinaryCodec,CompressedCodec,JsonCodec
+from client_socket import ClientSocket
+from file_transfer import FileTransfer,OutgoingFile
+from message import FrameDecoder,Message
+from tls import Tls
+class AsyncClientSocket(ClientSocket):
+    def __init__(self):
+        self._init_state()
+        self.writer:asyncio.StreamWriter|None=None
+        self.flusher:asyncio.TimerHandle|None=None
+        self.tasks:set[asyncio.Task]=set()
+    async def _init_socket(self):
+        self.reader,self.writer=await asyncio.open_connection(
+            self.config.host,
+            self.config.port,
+            ssl=self.ssl_context,
+            server_hostname=Tls.server_hostname(self.config) if self.ssl_context else None
+        )
+        self.decoder=FrameDecoder(self.config.maximum_text_limit,self.config.maximum_frame_limit)
+        self.codec:JsonCodec|BinaryCodec|CompressedCodec=JsonCodec()
+        self.running=True
+    async def connect(self):
+        await self._init_socket()
+        self.send(self.config.message_type.inquire,self.config.instruction.join,self.id,self.config.server_id,self.offer())
+    def close(self):
+        self.running=False
+        if self.writer is not None:
+            self.writer.close()
+        for task in self.tasks:
+            task.cancel()
+    def send(self,msg_type,instruction,sender,addressee,content=''):
+        message=Message(msg_type,instruction,sender,addressee,content)
+        self.pending.append(message)
+        if self.reconnecting or self.writer is None:
+            return
+        self.outbox+=Message.frame(self.codec.encode(message))
+        if len(self.outbox)>=self.config.send_batch_bytes or not self.config.send_linger:
+            self.flush()
+        elif self.flusher is None:
+            self.flusher=asyncio.get_running_loop().call_later(self.config.send_linger,self.flush)
+    def flush(self)->bool:
+        if self.flusher is not None:
+            self.flusher.cancel()
+            self.flusher=None
+        if self.reconnecting or self.writer is None or self.writer.is_closing():
+            return not self.pending
+        if self.outbox:
+            self.writer.write(bytes(self.outbox))
+            self.outbox.clear()
+            self.pending.clear()
+        return True
+    def write(self,message:Message):
+        self.writer.write(Message.frame(self.codec.encode(message)))
+    async def drain(self):
+        if self.flush() and self.writer is not None:
+            await self.writer.drain()
+    async def wait_flushed(self,timeout:float|None=None)->bool:
+        try:
+            await asyncio.wait_for(self.drain(),timeout)
+        except (asyncio.TimeoutError,ConnectionError):
+            return False
+        return not self.pending
+    def resume(self):
+        self.reconnecting=False
+        self.outbox.clear()
+        for message in self.pending:
+            self.outbox+=Message.frame(self.codec.encode(message))
+        self.flush()
+    def stream_file(self,transfer:OutgoingFile):
+        transfer.streaming=True
+        task=asyncio.get_running_loop().create_task(self.push_file(transfer))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+    def resume_file(self,transfer:OutgoingFile):
+        if not transfer.streaming:
+            self.stream_file(transfer)
+    async def push_file(self,transfer:OutgoingFile):
+        try:
+            self.send(self.config.message_type.transmit,self.config.instruction.file,self.id,transfer.addressee,transfer.header())
+            if not self.flush():
+                return
+            for frame in transfer.frames():
+                if self.reconnecting:
+                    break
+                self.writer.write(frame)
+                await self.writer.drain()
+        except (ConnectionError,OSError) as error:
+            print(f'Error sending file {transfer.path}:{error}')
+        finally:
+            transfer.streaming=False
+    async def receive(self):
+        while self.running:
+            try:
+                data=await self.reader.read(self.config.maximum_text_limit)
+                if not data:
+                    raise ConnectionResetError('The server closed the connection')
+                for payload in self.decoder.feed(data):
+                    if FileTransfer.is_chunk(payload):
+                        self.handle_chunk(payload)
+                    else:
+                        self.handle_receive(self.codec.decode(payload))
+            except (ConnectionError,ValueError) as error:
+                print(f'Error receiving message:{error}')
+                if not await self.reconnect():
+                    self.close()
+    async def heartbeat(self):
+        while self.running:
+            progress=self.progress()
+            self.send(self.config.message_type.detection,self.config.instruction.detect,self.id,self.config.server_id)
+            self.server_disconnected=True
+            await asyncio.sleep(self.config.heartbeat_rate)
+            if self.server_disconnected and self.progress()==progress:
+                print('We temporarily lost contact with the server.')
+                if not await self.reconnect():
+                    self.close()
+    async def reconnect(self):
+        self.reconnecting=True
+        self.outbox.clear()
+        for _ in range(self.config.maximum_attempt_limit):
+            try:
+                if self.writer is not None:
+                    self.writer.close()
+                await self._init_socket()
+                self.write(Message(self.config.message_type.inquire,self.config.instruction.call,self.id,self.config.server_id,self.offer()))
+                return True
+            except OSError as error:
+                print(f'Failed to reconnect to the server:{error}')
+                await asyncio.sleep(self.config.wait_attempt_rate)
+        return False
+    async def run(self):
+        await self.connect()
+        loops=[asyncio.create_task(self.receive()),asyncio.create_task(self.heartbeat())]
+        self.tasks.update(loops)
+        await asyncio.gather(*loops,return_exceptions=True)
+class AsyncClient:
+    def __init__(self,sessions=1):
+        self.sessions=[AsyncClientSocket() for _ in range(sessions)]
+    async def run(self):
+        await asyncio.gather(*(session.run() for session in self.sessions))
+    def start(self):
+        asyncio.run(self.run())
@@ -0,0 +1,84 @@
+import asyncio
+from connection import Connection
+from file_transfer import FileTransfer
+from server_socket import ServerSocket
+class AsyncServer(ServerSocket):
+    def _init_socket(self):
+        self.server:asyncio.Server|None=None
+    def _init_metrics(self):
+        self.metrics_socket=None
+    async def serve(self):
+        self.server=await asyncio.start_server(
+            self.serve_client,
+            self.config.host,
+            self.config.port,
+            backlog=self.config.backlog,
+            ssl=self.ssl_context
+        )
+        reaper=asyncio.create_task(self.reaper())
+        if self.metrics.enabled and self.metrics_port():
+            await asyncio.start_server(self.serve_stats,self.config.metrics_host,self.metrics_port())
+        async with self.server:
+            await self.server.serve_forever()
+        reaper.cancel()
+    async def reaper(self):
+        while self.running:
+            await asyncio.sleep(self.config.wheel_tick)
+            self.reap()
+    async def serve_stats(self,reader:asyncio.StreamReader,writer:asyncio.StreamWriter):
+        writer.write(self.metrics.dumps(self.gauges()))
+        await writer.drain()
+        writer.close()
+    async def serve_client(self,reader:asyncio.StreamReader,writer:asyncio.StreamWriter):
+        address=writer.get_extra_info('peername')
+        print(f'A client socket, from {address}, connect to server...')
+        connection=self.register(writer.get_extra_info('socket'),address)
+        connection.writer=writer
+        try:
+            while self.running:
+                data=await reader.read(self.config.maximum_text_limit)
+                if not data:
+                    break
+                self.touch(connection)
+                if self.metrics.enabled:
+                    self.metrics.count('in.bytes',len(data))
+                for payload in connection.decoder.feed(data):
+                    if FileTransfer.is_chunk(payload):
+                        self.transfer(connection,payload)
+                    else:
+                        self.handle(connection.codec.decode(payload),connection)
+                await self.throttle(connection)
+        except (ConnectionError,ValueError) as error:
+            print(f'Error receiving message:{error}')
+        finally:
+            self.disconnect(connection)
+    def queued(self,connection:Connection)->tuple[int,int]:
+        return connection.writer.transport.get_write_buffer_size(),0
+    def admit(self,connection:Connection,stateful:bool)->bool:
+        return not connection.writer.transport.is_closing() and super().admit(connection,stateful)
+    def queue(self,connection:Connection,frame:bytes):
+        if connection.writer.transport.is_closing():
+            return
+        if self.metrics.enabled:
+            self.metrics.count('out.bytes',len(frame))
+        connection.writer.write(frame)
+    def pause(self,connection:Connection,target:Connection):
+        connection.blocked_by.add(target)
+    async def throttle(self,connection:Connection):
+        for target in list(connection.blocked_by):
+            try:
+                await target.writer.drain()
+            except ConnectionError:
+                pass
+        connection.blocked_by.clear()
+    def disconnect(self,connection:Connection):
+        self.forget(connection)
+        connection.writer.close()
+    def close(self):
+        self.running=False
+        for connection in list(self.clients_dict.values()):
+            self.disconnect(connection)
+        if self.server is not None:
+            self.server.close()
+    def start(self):
+        asyncio.run(self.serve())
@@ -0,0 +1,264 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+import multiprocessing
+import os
+import random
+import resource
+import subprocess
+import threading
+import time
+import zlib
+from codec import BinaryCodec,Codec,JsonCodec
+from config import Config
+from config_manager import ConfigManager
+from file_transfer import CHUNK,MAGIC,FileTransfer
+from message import HEADER,FrameDecoder,Message
+from server_socket import ServerSocket
+class Benchmark:
+    @staticmethod
+    def measure(callback,count)->float:
+        start=time.perf_counter()
+        for _ in range(count):
+            callback()
+        return count/(time.perf_counter()-start)
+    @staticmethod
+    def decoding(count=100000)->dict:
+        payload=Message.dump('transmit','/text:','id1','id2','hello')
+        def relay_before():
+            message=Message.loads(payload) if Message.is_message(payload) else None
+            forwarded=Message.dumps(message)
+            Message.loads(forwarded)
+        def relay_after():
+            message=Message.decode(payload)
+            Message.frame(message.encode())
+        return {
+            'before':Benchmark.measure(relay_before,count),
+            'after':Benchmark.measure(relay_after,count)
+        }
+    @staticmethod
+    def codecs(count=100000)->dict:
+        config=ConfigManager.snapshot()
+        results={}
+        for codec in (JsonCodec(config),BinaryCodec(config)):
+            peer=type(codec)(config)
+            message=Message(config.message_type.transmit,config.instruction.text,'id1','id2','hello')
+            payload=codec.encode(message)
+            peer.decode(payload)
+            def round_trip():
+                message.raw=None
+                peer.decode(codec.encode(message))
+            results[codec.name]={
+                'bytes':len(codec.encode(message)),
+                'rate':Benchmark.measure(round_trip,count)
+            }
+        return results
+class Session:
+    def __init__(self,reader:asyncio.StreamReader,writer:asyncio.StreamWriter,config:Config):
+        self.reader=reader
+        self.writer=writer
+        self.decoder=FrameDecoder(config.maximum_text_limit,config.maximum_frame_limit)
+        self.codec:JsonCodec|BinaryCodec=JsonCodec()
+        self.id=None
+    def send(self,message:Message):
+        self.writer.write(Message.frame(self.codec.encode(message)))
+class RelayBenchmark:
+    def __init__(self,clients=100,messages=10000,mix=None,file_size=65536,rate=0.0,codec='json',timeout=60.0):
+        self.clients=clients
+        self.messages=messages
+        self.mix=mix if mix else {'unicast':0.8,'broadcast':0.1,'file':0.1}
+        self.file_size=file_size
+        self.rate=rate
+        self.codec=codec
+        self.timeout=timeout
+        self.config=dataclasses.replace(ConfigManager.snapshot(),host='127.0.0.1',port=0)
+        self.latencies:list[float]=[]
+        self.files_sent:dict[int,float]={}
+        self.expected=0
+        self.done=asyncio.Event()
+    @staticmethod
+    def serve(config:Config,pipe):
+        server=ServerSocket(config)
+        pipe.send(server.socket.getsockname()[1])
+        def report():
+            while pipe.recv()!='stop':
+                pipe.send(RelayBenchmark.usage())
+            server.running=False
+        threading.Thread(target=report,daemon=True).start()
+        while server.running:
+            server.poll()
+        server.close()
+    @staticmethod
+    def usage()->dict:
+        usage=resource.getrusage(resource.RUSAGE_SELF)
+        return {'cpu':usage.ru_utime+usage.ru_stime,'rss':RelayBenchmark.rss()}
+    @staticmethod
+    def rss()->int:
+        try:
+            with open('/proc/self/statm') as file:
+                return int(file.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+    @staticmethod
+    def percentile(values:list[float],fraction:float)->float:
+        if not values:
+            return 0.0
+        return values[min(len(values)-1,int(fraction*len(values)))]
+    @staticmethod
+    def commit()->str|None:
+        try:
+            return subprocess.run(['git','rev-parse','HEAD'],capture_output=True,text=True,check=True).stdout.strip()
+        except (OSError,subprocess.CalledProcessError):
+            return None
+    async def connect(self,port:int)->Session:
+        reader,writer=await asyncio.open_connection(self.config.host,port)
+        session=Session(reader,writer,self.config)
+        session.send(Message(
+            self.config.message_type.inquire,
+            self.config.instruction.join,
+            'benchmark',
+            self.config.server_id,
+            {'codecs':[self.codec]}
+        ))
+        while session.id is None:
+            for payload in session.decoder.feed(await reader.read(self.config.maximum_text_limit)):
+                message=session.codec.decode(payload)
+                if message is not None and message.instruction==self.config.instruction.id:
+                    session.id=message.content['id']
+                    session.codec=Codec.create(message.content['codec'],self.config)
+        return session
+    def delivered(self,latency:float):
+        self.latencies.append(latency)
+        if len(self.latencies)>=self.expected:
+            self.done.set()
+    async def receive(self,session:Session):
+        while True:
+            data=await session.reader.read(65536)
+            if not data:
+                return
+            now=time.perf_counter()
+            for payload in session.decoder.feed(data):
+                if FileTransfer.is_chunk(payload):
+                    sent=self.files_sent.get(FileTransfer.transfer_of(payload))
+                    if sent is not None:
+                        self.delivered(now-sent)
+                    continue
+                message=session.codec.decode(payload)
+                if message is None:
+                    continue
+                if message.instruction==self.config.instruction.text:
+                    self.delivered(now-message.content['sent'])
+                elif message.content==self.config.probe_content:
+                    session.send(Message(self.config.message_type.detection,self.config.instruction.detect,session.id,self.config.server_id))
+    async def produce(self,sessions:list[Session]):
+        kinds=list(self.mix)
+        weights=[self.mix[kind] for kind in kinds]
+        data=os.urandom(self.file_size)
+        for count in range(self.messages):
+            session=sessions[count%len(sessions)]
+            kind=random.choices(kinds,weights)[0]
+            if kind=='file':
+                peer=random.choice([other for other in sessions if other is not session])
+                number=random.getrandbits(32)
+                self.expected+=1
+                session.send(Message(
+                    self.config.message_type.transmit,
+                    self.config.instruction.file,
+                    session.id,
+                    peer.id,
+                    {'transfer':number,'filename':'benchmark','size':len(data),'offset':0}
+                ))
+                self.files_sent[number]=time.perf_counter()
+                session.writer.write(HEADER.pack(CHUNK.size+len(data))+CHUNK.pack(MAGIC,number,0,zlib.crc32(data))+data)
+            else:
+                if kind=='broadcast':
+                    addressee=self.config.broadcast_id
+                    self.expected+=len(sessions)-1
+                else:
+                    addressee=random.choice([other for other in sessions if other is not session]).id
+                    self.expected+=1
+                session.send(Message(
+                    self.config.message_type.transmit,
+                    self.config.instruction.text,
+                    session.id,
+                    addressee,
+                    {'sent':time.perf_counter()}
+                ))
+            await session.writer.drain()
+            if self.rate:
+                await asyncio.sleep(1/self.rate)
+    async def drive(self,port:int)->tuple[float,float]:
+        sessions=[await self.connect(port) for _ in range(self.clients)]
+        receivers=[asyncio.create_task(self.receive(session)) for session in sessions]
+        start=time.perf_counter()
+        await self.produce(sessions)
+        try:
+            await asyncio.wait_for(self.done.wait(),self.timeout)
+        except asyncio.TimeoutError:
+            pass
+        elapsed=time.perf_counter()-start
+        for session in sessions:
+            session.writer.close()
+        for receiver in receivers:
+            receiver.cancel()
+        return start,elapsed
+    def run(self)->dict:
+        parent,child=multiprocessing.Pipe()
+        process=multiprocessing.Process(target=RelayBenchmark.serve,args=(self.config,child),daemon=True)
+        process.start()
+        port=parent.recv()
+        parent.send('usage')
+        before=parent.recv()
+        _,elapsed=asyncio.run(self.drive(port))
+        parent.send('usage')
+        after=parent.recv()
+        parent.send('stop')
+        process.join(5)
+        latencies=sorted(self.latencies)
+        return {
+            'commit':RelayBenchmark.commit(),
+            'clients':self.clients,
+            'messages':self.messages,
+            'mix':self.mix,
+            'codec':self.codec,
+            'file_size':self.file_size,
+            'expected':self.expected,
+            'delivered':len(latencies),
+            'elapsed':elapsed,
+            'messages_per_second':self.messages/elapsed,
+            'deliveries_per_second':len(latencies)/elapsed,
+            'latency_ms':{
+                'p50':RelayBenchmark.percentile(latencies,0.5)*1000,
+                'p99':RelayBenchmark.percentile(latencies,0.99)*1000,
+                'p999':RelayBenchmark.percentile(latencies,0.999)*1000
+            },
+            'cpu_per_message_us':(after['cpu']-before['cpu'])/self.messages*1000000,
+            'rss_growth_bytes':after['rss']-before['rss']
+        }
+if __name__=='__main__':
+    parser=argparse.ArgumentParser()
+    commands=parser.add_subparsers(dest='command')
+    commands.add_parser('micro')
+    relay=commands.add_parser('relay')
+    relay.add_argument('--clients',type=int,default=100)
+    relay.add_argument('--messages',type=int,default=10000)
+    relay.add_argument('--mix',default='unicast=0.8,broadcast=0.1,file=0.1')
+    relay.add_argument('--file-size',type=int,default=65536)
+    relay.add_argument('--rate',type=float,default=0.0)
+    relay.add_argument('--codec',default='json')
+    relay.add_argument('--timeout',type=float,default=60.0)
+    relay.add_argument('--output')
+    args=parser.parse_args()
+    if args.command=='relay':
+        mix={kind:float(weight) for kind,weight in (item.split('=') for item in args.mix.split(','))}
+        result=RelayBenchmark(args.clients,args.messages,mix,args.file_size,args.rate,args.codec,args.timeout).run()
+        print(json.dumps(result,indent=4))
+        if args.output:
+            with open(args.output,'w') as file:
+                json.dump(result,file,indent=4)
+    else:
+        for name,rate in Benchmark.decoding().items():
+            print(f'{name}:{rate:.0f} messages/sec')
+        for name,result in Benchmark.codecs().items():
+            print(f'{name}:{result["bytes"]} bytes, {result["rate"]:.0f} messages/sec')
@@ -1,44 +1,136 @@
+import collections
+import os
 import socket
+import ssl
+import threading
 import time
-from config import Config
-from message import Message
+from codec import BinaryCodec,Codec,CompressedCodec,JsonCodec
+from config_manager import ConfigManager
+from dispatcher import Dispatcher
+from file_transfer import FileTransfer,IncomingFile,OutgoingFile
+from message import FrameDecoder,Message
+from tls import Tls
 class ClientSocket:
     def __init__(self):
-        self.config=Config()
+        self._init_state()
+        self.tls_session:ssl.SSLSession|None=None
+        self.outbox_ready=threading.Condition()
+        self.write_lock=threading.Lock()
+        self.lingering=False
         self._init_socket()
-        self.id=socket.gethostname()
         self.running=True
+        self.send(self.config.message_type.inquire,self.config.instruction.join,self.id,self.config.server_id,self.offer())
+    def _init_state(self):
+        self.config=ConfigManager.snapshot()
+        self.id=socket.gethostname()
+        self.running=False
         self.server_disconnected=False
-        self.send(self.config.message_type.inquire,self.config.instruction.join,self.id,self.config.server_id)
+        self.ssl_context=Tls.client_context(self.config)
+        self.token:str|None=None
+        self.pending:collections.deque[Message]=collections.deque()
+        self.outbox=bytearray()
+        self.reconnecting=False
+        self.transfers:dict[int,OutgoingFile]={}
+        self.receiving:dict[int,IncomingFile]={}
+        self._init_dispatcher()
     def _init_socket(self):
         try:
             self.running=True
             self.socket=socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+            if self.ssl_context is not None:
+                self.socket=self.ssl_context.wrap_socket(self.socket,server_hostname=Tls.server_hostname(self.config),session=self.tls_session)
             self.socket.connect((self.config.host,self.config.port))
+            self.decoder=FrameDecoder(self.config.maximum_text_limit,self.config.maximum_frame_limit)
+            self.codec:JsonCodec|BinaryCodec|CompressedCodec=JsonCodec()
         except socket.error as error:
             print(f'Error connecting to the server:{error}')
+    def disconnect(self):
+        if isinstance(self.socket,ssl.SSLSocket) and self.socket.session is not None:
+            self.tls_session=self.socket.session
+        self.socket.close()
     def close(self):
         self.running=False
-        self.socket.close()
-    def send(self,msg_type,instruction,sender,addressee,content=''):
         try:
-            message:bytes=Message.dump(msg_type,instruction,sender,addressee,content)
-            self.socket.sendall(message)
-        except socket.error as error:
-            print(f'Error sending message:{error}')
-            if not self.reconnect():
-                self.close()
-    def handle_send(self,message):
-        dictionary=Message.loads(message)
-        if dictionary is not None and type(dictionary)==dict:
-            if dictionary['instruction']==self.config.instruction.bye:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.disconnect()
+        with self.outbox_ready:
+            self.outbox_ready.notify_all()
+    def send(self,msg_type,instruction,sender,addressee,content=''):
+        message=Message(msg_type,instruction,sender,addressee,content)
+        with self.outbox_ready:
+            self.pending.append(message)
+            if not self.reconnecting:
+                self.outbox+=Message.frame(self.codec.encode(message))
+            full=len(self.outbox)>=self.config.send_batch_bytes
+            self.outbox_ready.notify_all()
+        if full or not self.lingering or not self.config.send_linger:
+            self.flush()
+    def write(self,message:Message):
+        with self.write_lock:
+            self.socket.sendall(Message.frame(self.codec.encode(message)))
+    def flush(self)->bool:
+        with self.write_lock:
+            with self.outbox_ready:
+                if self.reconnecting or not self.outbox:
+                    return not self.pending
+                data=bytes(self.outbox)
+                batch=list(self.pending)
+                self.outbox.clear()
+                self.pending.clear()
+            try:
+                self.socket.sendall(data)
+            except socket.error as error:
+                print(f'Error sending message:{error}')
+                with self.outbox_ready:
+                    self.pending.extendleft(reversed(batch))
+            else:
+                with self.outbox_ready:
+                    self.outbox_ready.notify_all()
+                return True
+        if not self.reconnect():
+            self.close()
+        return False
+    def wait_flushed(self,timeout:float|None=None)->bool:
+        self.flush()
+        with self.outbox_ready:
+            return self.outbox_ready.wait_for(lambda:not self.pending or not self.running,timeout) and not self.pending
+    def linger(self):
+        self.lingering=True
+        with self.outbox_ready:
+            if not self.outbox_ready.wait_for(lambda:self.outbox or not self.running,self.config.heartbeat_rate) or not self.running:
+                return
+        time.sleep(self.config.send_linger)
+        self.flush()
+    def sleep(self,seconds:float)->bool:
+        with self.outbox_ready:
+            self.outbox_ready.wait_for(lambda:not self.running,seconds)
+        return self.running
+    def resume(self):
+        with self.outbox_ready:
+            self.reconnecting=False
+            self.outbox.clear()
+            for message in self.pending:
+                self.outbox+=Message.frame(self.codec.encode(message))
+        self.flush()
+    def handle_send(self,message:Message):
+        if message is not None:
+            if message.instruction==self.config.instruction.bye:
                 self.close()
     def receive(self):
         try:
-            message=self.socket.recv(self.config.maximum_text_limit)
-            if Message.is_message(message):
-                self.handle_receive(Message.loads(message))
-        except socket.error as error:
+            frames=self.decoder.recv_frames(self.socket)
+            if frames is None:
+                raise ConnectionResetError('The server closed the connection')
+            for payload in frames:
+                if FileTransfer.is_chunk(payload):
+                    self.handle_chunk(payload)
+                else:
+                    self.handle_receive(self.codec.decode(payload))
+        except (socket.error,ValueError) as error:
+            if not self.running:
+                return
             print(f'Error receiving message:{error}')
             if not self.reconnect():
                 self.close()
@@ -50,102 +142,160 @@ class ClientSocket:
             addressee,
             error_type
         )
-    def handle_receive(self,dictionary):
-        if dictionary is not None and type(dictionary)==dict:
-            match dictionary['type']:
-                case self.config.message_type.transmit:
-                    match dictionary['instruction']:
-                        case self.config.instruction.text:
-                            print(f'{dictionary['sender']}:{dictionary['content']}')
-                        case self.config.instruction.file:
-                            filename=dictionary['content']['filename']
-                            file_content=dictionary['content']['file_content']
-                            with open(filename,'w') as file:
-                                file.write(file_content)
-                        case instruction if instruction in self.config.instruction.difference({
-                            self.config.instruction.text,
-                            self.config.instruction.file
-                        }):
-                            self.error_report(dictionary['sender'],self.config.error.WrongInstruction)
-                        case _:
-                            self.error_report(dictionary['sender'],self.config.error.InstructionNotExist)
-                case self.config.message_type.detection:
-                    match dictionary['instruction']:
-                        case self.config.instruction.detect:
-                            match dictionary['sender']:
-                                case self.config.server_id:
-                                    self.server_disconnected=False
-                                case _:
-                                    self.error_report(dictionary['sender'],self.config.error.WrongAddressee)
-                        case instruction if instruction in instruction.difference({
-                            self.config.instruction.detect
-                        }):
-                            self.error_report(dictionary['sender'],self.config.error.WrongInstruction)
-                        case _:
-                            self.error_report(dictionary['sender'],self.config.error.InstructionNotExist)
-                case self.config.message_type.inquire:
-                    match dictionary['instruction']:
-                        case self.config.instruction.bye:
-                            print(f'{dictionary['sender']}:Communication stopped')
-                        case instruction if instruction in self.config.instruction.difference({
-                            self.config.instruction.bye
-                        }):
-                            self.error_report(dictionary['sender'],self.config.error.WrongInstruction)
-                        case _:
-                            self.error_report(dictionary['sender'],self.config.error.InstructionNotExist)
-                case self.config.message_type.respond:
-                    match dictionary['instruction']:
-                        case self.config.instruction.id:
-                            match dictionary['sender']:
-                                case self.config.server_id:
-                                    self.id=dictionary["content"]
-                                    print(f'You\'ve been assigned:{dictionary["content"]}')
-                                case _:
-                                    self.error_report(dictionary['sender'],self.config.error.WrongAddressee)
-                        case self.config.instruction.known:
-                            match dictionary['sender']:
-                                case self.config.server_id:
-                                    print('You reconnected to the server.')
-                                case _:
-                                    self.error_report(dictionary['sender'],self.config.error.WrongAddressee)
-                        case instruction if instruction in instruction.difference({
-                            self.config.instruction.id,
-                            self.config.instruction.known
-                        }):
-                            self.error_report(dictionary['sender'],self.config.error.WrongInstruction)
-                        case _:
-                            self.error_report(dictionary['sender'],self.config.error.InstructionNotExist)
-                case self.config.message_type.report:
-                    match dictionary['instruction']:
-                        case self.config.instruction.error:
-                            print(f'An error occurs:{dictionary["content"]}')
-                        case instruction if instruction in instruction.difference({
-                            self.config.instruction.error
-                        }):
-                            self.error_report(dictionary['sender'],self.config.error.WrongInstruction)
-                        case _:
-                            self.error_report(dictionary['sender'],self.config.error.InstructionNotExist)
-                case _:
-                    self.error_report(dictionary['sender'],self.config.error.MessageTypeNotExist)
+    def _init_dispatcher(self):
+        message_type=self.config.message_type
+        instruction=self.config.instruction
+        self.dispatcher=Dispatcher(self.config,self.sender_kind,self.dispatch_error)
+        self.dispatcher.register(message_type.transmit,instruction.text,self.handle_text)
+        self.dispatcher.register(message_type.transmit,instruction.file,self.handle_file)
+        self.dispatcher.register(message_type.detection,instruction.detect,self.handle_detect,'server')
+        self.dispatcher.register(message_type.inquire,instruction.bye,self.handle_bye)
+        self.dispatcher.register(message_type.respond,instruction.id,self.handle_assigned,'server')
+        self.dispatcher.register(message_type.respond,instruction.known,self.handle_known,'server')
+        self.dispatcher.register(message_type.respond,instruction.group,self.handle_group,'server')
+        self.dispatcher.register(message_type.respond,instruction.leave,self.handle_leave,'server')
+        self.dispatcher.register(message_type.report,instruction.error,self.handle_error)
+    def sender_kind(self,message:Message)->str:
+        return 'server' if message.sender==self.config.server_id else 'peer'
+    def dispatch_error(self,message:Message,error_type):
+        self.error_report(message.sender,error_type)
+    def handle_receive(self,message:Message):
+        if message is not None:
+            self.dispatcher.dispatch(message)
+    def handle_text(self,message:Message):
+        print(f'{message.sender}:{message.content}')
+    def handle_detect(self,message:Message):
+        self.server_disconnected=False
+        if message.content==self.config.probe_content:
+            self.send(self.config.message_type.detection,self.config.instruction.detect,self.id,self.config.server_id)
+    def handle_bye(self,message:Message):
+        print(f'{message.sender}:Communication stopped')
+    def handle_assigned(self,message:Message):
+        self.negotiated(message.content)
+        print(f'You\'ve been assigned:{self.id}')
+    def handle_known(self,message:Message):
+        self.negotiated(message.content)
+        print('You reconnected to the server.')
+        self.resume()
+        for transfer in list(self.transfers.values()):
+            self.resume_file(transfer)
+        for incoming in list(self.receiving.values()):
+            self.request_rewind(incoming,incoming.resume())
+    def handle_group(self,message:Message):
+        print(f'You joined group:{message.content}')
+    def handle_leave(self,message:Message):
+        print(f'You left group:{message.content}')
+    def handle_error(self,message:Message):
+        print(f'An error occurs:{message.content}')
+    def join_group(self,group_id:str):
+        self.send(self.config.message_type.inquire,self.config.instruction.group,self.id,self.config.server_id,group_id)
+    def leave_group(self,group_id:str):
+        self.send(self.config.message_type.inquire,self.config.instruction.leave,self.id,self.config.server_id,group_id)
+    def send_file(self,addressee,path)->int:
+        transfer=OutgoingFile(path,addressee,self.config.file_chunk_size)
+        self.transfers[transfer.number]=transfer
+        self.stream_file(transfer)
+        return transfer.number
+    def stream_file(self,transfer:OutgoingFile):
+        transfer.streaming=True
+        try:
+            self.send(self.config.message_type.transmit,self.config.instruction.file,self.id,transfer.addressee,transfer.header())
+            if self.flush():
+                transfer.stream(self.socket,self.write_lock)
+        except socket.error as error:
+            print(f'Error sending file {transfer.path}:{error}')
+            transfer.streaming=False
+            if not self.reconnect():
+                self.close()
+        finally:
+            transfer.streaming=False
+    def resume_file(self,transfer:OutgoingFile):
+        if transfer.streaming:
+            return
+        transfer.streaming=True
+        threading.Thread(target=self.stream_file,args=(transfer,),daemon=True).start()
+    def handle_file(self,message:Message):
+        content=message.content
+        if FileTransfer.is_rewind(content):
+            transfer=self.transfers.get(content['transfer'])
+            if transfer is None:
+                return
+            if content['offset']>=transfer.size:
+                del self.transfers[transfer.number]
+                print(f'{transfer.addressee} received file:{transfer.path}')
+                return
+            transfer.rewind(content['offset'])
+            self.resume_file(transfer)
+        elif FileTransfer.is_header(content):
+            incoming=self.receiving.get(content['transfer'])
+            if incoming is None:
+                path=os.path.join(self.config.download_dir,os.path.basename(content['filename']))
+                incoming=IncomingFile(content['transfer'],path,content['size'],message.sender)
+                self.receiving[incoming.number]=incoming
+            offset=incoming.expect(content['offset'])
+            if offset is not None:
+                self.request_rewind(incoming,offset)
+            elif incoming.complete():
+                self.finish_file(incoming)
+        else:
+            with open(content['filename'],'w') as file:
+                file.write(content['file_content'])
+    def handle_chunk(self,payload:bytes):
+        incoming=self.receiving.get(FileTransfer.transfer_of(payload))
+        if incoming is None:
+            return
+        offset=incoming.write(payload)
+        if offset is not None:
+            self.request_rewind(incoming,offset)
+        elif incoming.complete():
+            self.finish_file(incoming)
+    def request_rewind(self,incoming:IncomingFile,offset:int):
+        self.send(self.config.message_type.transmit,self.config.instruction.file,self.id,incoming.sender,{'transfer':incoming.number,'offset':offset})
+    def finish_file(self,incoming:IncomingFile):
+        incoming.close()
+        del self.receiving[incoming.number]
+        self.request_rewind(incoming,incoming.size)
+        print(f'{incoming.sender} sent file:{incoming.path}')
+    def offer(self)->dict:
+        offer={'codecs':self.config.codecs}
+        if self.config.compression_enabled:
+            offer['compression']=CompressedCodec.name
+        if self.token is not None:
+            offer['token']=self.token
+        return offer
+    def negotiated(self,content):
+        if type(content)!=dict:
+            self.id=content
+            return
+        self.id=content.get('id',self.id)
+        self.token=content.get('token',self.token)
+        self.codec=Codec.compressed(Codec.create(content.get('codec'),self.config),content.get('compression'),self.config)
+    def progress(self)->int:
+        return sum(transfer.offset for transfer in list(self.transfers.values()))
     def heartbeat(self):
+        progress=self.progress()
         self.send(self.config.message_type.detection,self.config.instruction.detect,self.id,self.config.server_id)
         self.server_disconnected=True
-        time.sleep(self.config.heartbeat_rate)
-        if self.server_disconnected:
+        if not self.sleep(self.config.heartbeat_rate):
+            return
+        if self.server_disconnected and self.progress()==progress:
             print('We temporarily lost contact with the server.')
             if not self.reconnect():
                 self.close()
     def reconnect(self):
+        with self.outbox_ready:
+            self.reconnecting=True
+            self.outbox.clear()
         attempt=1
-        while True:
+        while self.running:
             if attempt>self.config.maximum_attempt_limit:
                 break
             try:
-                self.close()
+                self.disconnect()
                 self._init_socket()
-                self.send(self.config.message_type.inquire,self.config.instruction.call,self.id,self.config.server_id)
+                self.write(Message(self.config.message_type.inquire,self.config.instruction.call,self.id,self.config.server_id,self.offer()))
                 return True
             except Exception as error:
                 print(f'Failed to reconnect to the server:{error}')
                 attempt+=1
-                time.sleep(self.config.wait_attempt_rate)
+                self.sleep(self.config.wait_attempt_rate)
@@ -0,0 +1,153 @@
+import json
+import struct
+import zlib
+from config import Config
+from message import Message
+MAGIC=0xB1
+HEAD=struct.Struct('!BBB')
+SHORT=struct.Struct('!H')
+LITERAL=0xFF
+NEW=0x8000
+RAW=0xFFFF
+COMPRESSED=0xD7
+class JsonCodec:
+    name='json'
+    shared=True
+    def __init__(self,config:Config|None=None):
+        pass
+    def encode(self,message:Message)->bytes:
+        return message.encode()
+    def decode(self,payload:bytes)->Message|None:
+        return Message.decode(payload)
+class BinaryCodec:
+    name='binary'
+    shared=False
+    def __init__(self,config:Config):
+        self.types=list(vars(config.message_type).values())
+        self.instructions=[value for value in vars(config.instruction).values() if type(value)==str]
+        self.type_codes={value:code for code,value in enumerate(self.types)}
+        self.instruction_codes={value:code for code,value in enumerate(self.instructions)}
+        self.encode_table:dict[str,int]={}
+        self.decode_table:list[str]=[]
+    def encode(self,message:Message)->bytes:
+        if type(message.sender)!=str or type(message.addressee)!=str:
+            return message.encode()
+        type_code=self.type_codes.get(message.type,LITERAL)
+        instruction_code=self.instruction_codes.get(message.instruction,LITERAL)
+        buffer=bytearray(HEAD.pack(MAGIC,type_code,instruction_code))
+        if type_code==LITERAL:
+            self._put_string(buffer,str(message.type))
+        if instruction_code==LITERAL:
+            self._put_string(buffer,str(message.instruction))
+        self._put_id(buffer,message.sender)
+        self._put_id(buffer,message.addressee)
+        if type(message.content)==str:
+            buffer.append(0)
+            buffer+=message.content.encode()
+        else:
+            buffer.append(1)
+            buffer+=json.dumps(message.content).encode()
+        return bytes(buffer)
+    def decode(self,payload:bytes)->Message|None:
+        if not payload or payload[0]!=MAGIC:
+            return Message.decode(payload)
+        try:
+            view=memoryview(payload)
+            _,type_code,instruction_code=HEAD.unpack_from(view,0)
+            offset=HEAD.size
+            if type_code==LITERAL:
+                msg_type,offset=self._get_string(view,offset)
+            else:
+                msg_type=self.types[type_code]
+            if instruction_code==LITERAL:
+                instruction,offset=self._get_string(view,offset)
+            else:
+                instruction=self.instructions[instruction_code]
+            sender,offset=self._get_id(view,offset)
+            addressee,offset=self._get_id(view,offset)
+            data=bytes(view[offset+1:])
+            content=data.decode() if view[offset]==0 else json.loads(data)
+        except (IndexError,struct.error,UnicodeDecodeError,json.JSONDecodeError):
+            return None
+        return Message(msg_type,instruction,sender,addressee,content)
+    def _put_string(self,buffer:bytearray,value:str):
+        data=value.encode()
+        buffer+=SHORT.pack(len(data))
+        buffer+=data
+    def _get_string(self,view:memoryview,offset:int)->tuple[str,int]:
+        (size,)=SHORT.unpack_from(view,offset)
+        offset+=SHORT.size
+        return str(view[offset:offset+size],'utf-8'),offset+size
+    def _put_id(self,buffer:bytearray,value:str):
+        code=self.encode_table.get(value)
+        if code is not None:
+            buffer+=SHORT.pack(code)
+            return
+        if len(self.encode_table)<RAW-NEW:
+            code=len(self.encode_table)
+            self.encode_table[value]=code
+            buffer+=SHORT.pack(NEW|code)
+        else:
+            buffer+=SHORT.pack(RAW)
+        self._put_string(buffer,value)
+    def _get_id(self,view:memoryview,offset:int)->tuple[str,int]:
+        (code,)=SHORT.unpack_from(view,offset)
+        offset+=SHORT.size
+        if code<NEW:
+            return self.decode_table[code],offset
+        value,offset=self._get_string(view,offset)
+        if code!=RAW:
+            self.decode_table.append(value)
+        return value,offset
+class CompressedCodec:
+    name='zlib'
+    shared=False
+    def __init__(self,inner:JsonCodec|BinaryCodec,config:Config):
+        self.inner=inner
+        zdict=CompressedCodec.dictionary(config)
+        self.compressor=zlib.compressobj(config.compression_level,zlib.DEFLATED,-zlib.MAX_WBITS,zdict=zdict)
+        self.decompressor=zlib.decompressobj(-zlib.MAX_WBITS,zdict=zdict)
+    @staticmethod
+    def dictionary(config:Config)->bytes:
+        words=[
+            *vars(config.error).values(),
+            *(value for value in vars(config.instruction).values() if type(value)==str),
+            *vars(config.message_type).values(),
+            config.server_id,
+            config.broadcast_id,
+            '"transfer": ','"filename": ','"size": ','"offset": ','"codec": ','"id": ','"id'
+        ]
+        return ' '.join(words).encode()+b'{"type": "", "instruction": "", "sender": "", "addressee": "", "content": '
+    def encode(self,message:Message)->bytes:
+        data=self.inner.encode(message)
+        return bytes((COMPRESSED,))+self.compressor.compress(data)+self.compressor.flush(zlib.Z_SYNC_FLUSH)
+    def decode(self,payload:bytes)->Message|None:
+        if not payload or payload[0]!=COMPRESSED:
+            return self.inner.decode(payload)
+        try:
+            data=self.decompressor.decompress(memoryview(payload)[1:])
+        except zlib.error:
+            return None
+        return self.inner.decode(data)
+class Codec:
+    CODECS={
+        JsonCodec.name:JsonCodec,
+        BinaryCodec.name:BinaryCodec
+    }
+    COMPRESSIONS={
+        CompressedCodec.name:CompressedCodec
+    }
+    @staticmethod
+    def create(name,config:Config)->JsonCodec|BinaryCodec:
+        return Codec.CODECS.get(name,JsonCodec)(config)
+    @staticmethod
+    def negotiate(offered,config:Config)->JsonCodec|BinaryCodec:
+        for name in offered if type(offered)==list else []:
+            if name in Codec.CODECS:
+                return Codec.create(name,config)
+        return JsonCodec(config)
+    @staticmethod
+    def compressed(codec:JsonCodec|BinaryCodec,compression,config:Config)->JsonCodec|BinaryCodec|CompressedCodec:
+        if config.compression_enabled and type(compression)==str and compression in Codec.COMPRESSIONS:
+            return Codec.COMPRESSIONS[compression](codec,config)
+        return codec
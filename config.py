@@ -1,37 +1,37 @@
-from config_manager import ConfigManager
-class Config:
-    def __init__(self):
-        self.host=ConfigManager.get('server','host')
-        self.port=int(ConfigManager.get('server','port'))
-        self.server_id=ConfigManager.get('server','server_id')
-        self.broadcast_id=ConfigManager.get('client','broadcast_id')
-        self.heartbeat_rate=int(ConfigManager.get('client','heartbeat_rate'))
-        self.wait_attempt_rate=int(ConfigManager.get('client','wait_attempt_rate'))
-        self.maximum_attempt_limit=int(ConfigManager.get('client','maximum_attempt_limit'))
-        self.maximum_text_limit=int(ConfigManager.get('text','maximum_text_limit'))
-        self.message_type=MessageType()
-        self.instruction=Instruction()
-        self.error=Error()
+from dataclasses import dataclass,field
+SLOW_CONSUMER_POLICIES=('drop','disconnect')
+@dataclass(frozen=True)
 class MessageType:
-    def __init__(self):
-        self.transmit=ConfigManager.get('message_type','transmit')
-        self.detection=ConfigManager.get('message_type','detection')
-        self.inquire=ConfigManager.get('message_type','inquire')
-        self.respond=ConfigManager.get('message_type','respond')
-        self.report=ConfigManager.get('message_type','report')
+    transmit:str
+    detection:str
+    inquire:str
+    respond:str
+    report:str
+    @staticmethod
+    def load(section:dict)->'MessageType':
+        return MessageType(
+            transmit=section['transmit'],
+            detection=section['detection'],
+            inquire=section['inquire'],
+            respond=section['respond'],
+            report=section['report']
+        )
+@dataclass(frozen=True)
 class Instruction:
-    def __init__(self):
-        self.text=ConfigManager.get('instruction','send_text')
-        self.file=ConfigManager.get('instruction','send_file')
-        self.error=ConfigManager.get('instruction','send_error')
-        self.bye=ConfigManager.get('instruction','end_communication')
-        self.join=ConfigManager.get('instruction','request_to_join')
-        self.id=ConfigManager.get('instruction','allocation_id')
-        self.call=ConfigManager.get('instruction','request_reconnection')
-        self.known=ConfigManager.get('instruction','successfull_reconnection')
-        self.detect=ConfigManager.get('instruction','heartbeat_detection')
-    def difference(self,A:set):
-        B={
+    text:str
+    file:str
+    error:str
+    bye:str
+    join:str
+    id:str
+    call:str
+    known:str
+    detect:str
+    group:str
+    leave:str
+    all:frozenset=field(init=False,repr=False,compare=False)
+    def __post_init__(self):
+        object.__setattr__(self,'all',frozenset({
             self.text,
             self.file,
             self.error,
@@ -40,20 +40,156 @@ class Instruction:
             self.id,
             self.call,
             self.known,
-            self.detect
-        }
-        C:set=B.difference(A)
+            self.detect,
+            self.group,
+            self.leave
+        }))
+    def difference(self,A:set):
+        C:set=self.all.difference(A)
         return C
+    @staticmethod
+    def load(section:dict)->'Instruction':
+        return Instruction(
+            text=section['send_text'],
+            file=section['send_file'],
+            error=section['send_error'],
+            bye=section['end_communication'],
+            join=section['request_to_join'],
+            id=section['allocation_id'],
+            call=section['request_reconnection'],
+            known=section['successfull_reconnection'],
+            detect=section['heartbeat_detection'],
+            group=section['join_group'],
+            leave=section['leave_group']
+        )
+@dataclass(frozen=True)
 class Error:
-    def __init__(self):
-        self.AddresseeNotExist=ConfigManager.get('error','AddresseeNotExist')
-        self.InstructionNotExist=ConfigManager.get('error','InstructionNotExist')
-        self.MessageTypeNotExist=ConfigManager.get('error','MessageTypeNotExist')
-        self.WrongAddressee=ConfigManager.get('error','WrongAddressee')
-        self.WrongInstruction=ConfigManager.get('error','WrongInstruction')
-        self.WrongMessageType=ConfigManager.get('error','WrongMessageType')
-        InstructionNotExist=CONFIG.get('ERROR','InstructionNotExist')
-        MessageTypeNotExist=CONFIG.get('ERROR','MessageTypeNotExist')
-        WrongAddressee=CONFIG.get('ERROR','WrongAddressee')
-        WrongInstruction=CONFIG.get('ERROR','WrongInstruction')
-        WrongMessageType=CONFIG.get('ERROR','WrongMessageType')
+    AddresseeNotExist:str
+    InstructionNotExist:str
+    MessageTypeNotExist:str
+    WrongAddressee:str
+    WrongInstruction:str
+    WrongMessageType:str
+    @staticmethod
+    def load(section:dict)->'Error':
+        return Error(**{name:section[name] for name in Error.__dataclass_fields__})
+@dataclass(frozen=True)
+class Config:
+    host:str
+    port:int
+    server_id:str
+    backlog:int
+    select_timeout:float
+    outbox_bytes_limit:int
+    outbox_messages_limit:int
+    coalesce_limit:int
+    slow_consumer_policy:str
+    slow_consumer_grace:float
+    slow_consumer_hard_factor:int
+    idle_timeout:float
+    probe_grace:float
+    probe_content:str
+    wheel_tick:float
+    wheel_slots:int
+    broadcast_id:str
+    heartbeat_rate:int
+    wait_attempt_rate:int
+    maximum_attempt_limit:int
+    codecs:tuple[str,...]
+    send_linger:float
+    send_batch_bytes:int
+    maximum_text_limit:int
+    maximum_frame_limit:int
+    metrics_enabled:bool
+    metrics_host:str
+    metrics_port:int
+    metrics_dump_interval:float
+    metrics_dump_file:str
+    file_chunk_size:int
+    download_dir:str
+    store_enabled:bool
+    store_dir:str
+    store_segment_size:int
+    store_sync_interval:float
+    store_sync_batch:int
+    store_retention_bytes:int
+    store_retention_age:float
+    tls_enabled:bool
+    tls_certfile:str
+    tls_keyfile:str
+    tls_cafile:str
+    tls_verify:bool
+    tls_require_client_cert:bool
+    tls_client_certfile:str
+    tls_client_keyfile:str
+    tls_server_hostname:str
+    compression_enabled:bool
+    compression_level:int
+    message_type:MessageType
+    instruction:Instruction
+    error:Error
+    @staticmethod
+    def load(data:dict)->'Config':
+        server=data['server']
+        client=data['client']
+        text=data['text']
+        metrics=data['metrics']
+        store=data['store']
+        tls=data['tls']
+        if server['slow_consumer_policy'] not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow_consumer_policy:{server['slow_consumer_policy']}")
+        return Config(
+            host=server['host'],
+            port=int(server['port']),
+            server_id=server['server_id'],
+            backlog=int(server['backlog']),
+            select_timeout=float(server['select_timeout']),
+            outbox_bytes_limit=int(server['outbox_bytes_limit']),
+            outbox_messages_limit=int(server['outbox_messages_limit']),
+            coalesce_limit=int(server['coalesce_limit']),
+            slow_consumer_policy=server['slow_consumer_policy'],
+            slow_consumer_grace=float(server['slow_consumer_grace']),
+            slow_consumer_hard_factor=int(server['slow_consumer_hard_factor']),
+            idle_timeout=float(server['idle_timeout']),
+            probe_grace=float(server['probe_grace']),
+            probe_content=server['probe_content'],
+            wheel_tick=float(server['wheel_tick']),
+            wheel_slots=int(server['wheel_slots']),
+            broadcast_id=client['broadcast_id'],
+            heartbeat_rate=int(client['heartbeat_rate']),
+            wait_attempt_rate=int(client['wait_attempt_rate']),
+            maximum_attempt_limit=int(client['maximum_attempt_limit']),
+            codecs=tuple(client['codecs']),
+            send_linger=float(client['send_linger']),
+            send_batch_bytes=int(client['send_batch_bytes']),
+            maximum_text_limit=int(text['maximum_text_limit']),
+            maximum_frame_limit=int(text['maximum_frame_limit']),
+            metrics_enabled=bool(metrics['enabled']),
+            metrics_host=metrics['host'],
+            metrics_port=int(metrics['port']),
+            metrics_dump_interval=float(metrics['dump_interval']),
+            metrics_dump_file=metrics['dump_file'],
+            file_chunk_size=int(data['file']['chunk_size']),
+            download_dir=data['file']['download_dir'],
+            store_enabled=bool(store['enabled']),
+            store_dir=store['directory'],
+            store_segment_size=int(store['segment_size']),
+            store_sync_interval=float(store['sync_interval']),
+            store_sync_batch=int(store['sync_batch']),
+            store_retention_bytes=int(store['retention_bytes']),
+            store_retention_age=float(store['retention_age']),
+            tls_enabled=bool(tls['enabled']),
+            tls_certfile=tls['certfile'],
+            tls_keyfile=tls['keyfile'],
+            tls_cafile=tls['cafile'],
+            tls_verify=bool(tls['verify']),
+            tls_require_client_cert=bool(tls['require_client_cert']),
+            tls_client_certfile=tls['client_certfile'],
+            tls_client_keyfile=tls['client_keyfile'],
+            tls_server_hostname=tls['server_hostname'],
+            compression_enabled=bool(data['compression']['enabled']),
+            compression_level=int(data['compression']['level']),
+            message_type=MessageType.load(data['message_type']),
+            instruction=Instruction.load(data['instruction']),
+            error=Error.load(data['error'])
+        )
@@ -1,18 +1,83 @@
 import json
 import os
+import signal
+import threading
+import time
+from typing import Callable
+from config import Config
 class ConfigManager:
-    config_file_path='config.json'
+    config_file_path=os.path.join(os.path.dirname(os.path.abspath(__file__)),'config.json')
     config_file_mtime=None
     config_cache={}
+    config:Config|None=None
+    subscribers:list[Callable[[Config],None]]=[]
+    lock=threading.RLock()
+    watcher:threading.Thread|None=None
     @classmethod
-    def updata(cls):
-        file_mtime=os.path.getmtime(cls.config_file_path)
-        if cls.config_file_mtime!=file_mtime:
-            cls.config_file_mtime=file_mtime
-            cls.config_cache.clear()
+    def load(cls)->Config:
+        with cls.lock:
+            file_mtime=os.path.getmtime(cls.config_file_path)
             with open(cls.config_file_path,'r') as file:
-                cls.config_cache=json.loads(file.read())
+                config_cache=json.loads(file.read())
+            config=Config.load(config_cache)
+            cls.config_file_mtime=file_mtime
+            cls.config_cache=config_cache
+            cls.config=config
+        return config
+    @classmethod
+    def reload(cls)->Config:
+        config=cls.load()
+        for callback in list(cls.subscribers):
+            callback(config)
+        return config
+    @classmethod
+    def snapshot(cls)->Config:
+        config=cls.config
+        return config if config is not None else cls.load()
+    @classmethod
+    def resolve(cls,path:str)->str:
+        return os.path.join(os.path.dirname(os.path.abspath(cls.config_file_path)),path)
+    @classmethod
+    def subscribe(cls,callback:Callable[[Config],None]):
+        cls.subscribers.append(callback)
+    @classmethod
+    def unsubscribe(cls,callback:Callable[[Config],None]):
+        if callback in cls.subscribers:
+            cls.subscribers.remove(callback)
+    @classmethod
+    def updata(cls)->bool:
+        try:
+            file_mtime=os.path.getmtime(cls.config_file_path)
+        except OSError:
+            return False
+        if cls.config_file_mtime==file_mtime:
+            return False
+        try:
+            cls.reload()
+        except (OSError,ValueError,KeyError,TypeError):
+            return False
+        return True
+    @classmethod
+    def watch(cls,interval:float=1.0)->threading.Thread:
+        if cls.watcher is None:
+            def run():
+                while True:
+                    time.sleep(interval)
+                    cls.updata()
+            cls.watcher=threading.Thread(target=run,daemon=True)
+            cls.watcher.start()
+        return cls.watcher
+    @classmethod
+    def install_signal_handler(cls):
+        if hasattr(signal,'SIGHUP') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP,cls.handle_signal)
+    @classmethod
+    def handle_signal(cls,signum,frame):
+        try:
+            cls.reload()
+        except (OSError,ValueError,KeyError,TypeError) as error:
+            print(f'Error reloading configuration:{error}')
     @classmethod
     def get(cls,section,option):
-        ConfigManager.updata()
+        cls.snapshot()
         return cls.config_cache[section][option]
@@ -0,0 +1,56 @@
+import asyncio
+import collections
+import itertools
+import socket
+import ssl
+from codec import BinaryCodec,CompressedCodec,JsonCodec
+from message import FrameDecoder,Message
+WOULD_BLOCK=(BlockingIOError,ssl.SSLWantReadError,ssl.SSLWantWriteError)
+class Connection:
+    def __init__(self,the_socket:socket.socket,address,id:str,decoder:FrameDecoder):
+        self.socket=the_socket
+        self.address=address
+        self.id=id
+        self.decoder=decoder
+        self.codec:JsonCodec|BinaryCodec|CompressedCodec=JsonCodec()
+        self.outbox:collections.deque[bytes|memoryview]=collections.deque()
+        self.outbox_bytes=0
+        self.writing=False
+        self.over_limit_since:float|None=None
+        self.dropped=0
+        self.groups:set[str]=set()
+        self.transfers:dict[int,Message]={}
+        self.waiting:set[Connection]=set()
+        self.blocked_by:set[Connection]=set()
+        self.last_seen=0.0
+        self.probed=False
+        self.writer:asyncio.StreamWriter|None=None
+        self.vectored=hasattr(the_socket,'sendmsg') and not isinstance(the_socket,ssl.SSLSocket)
+        self.handshaking=False
+    def fileno(self):
+        return self.socket.fileno()
+    def enqueue(self,frame:bytes):
+        self.outbox.append(frame)
+        self.outbox_bytes+=len(frame)
+    def flush(self,coalesce_limit:int)->bool:
+        while self.outbox:
+            frames=list(itertools.islice(self.outbox,coalesce_limit))
+            try:
+                if self.vectored:
+                    sent=self.socket.sendmsg(frames)
+                else:
+                    sent=self.socket.send(b''.join(frames))
+            except WOULD_BLOCK:
+                return False
+            self.outbox_bytes-=sent
+            drained=sent==sum(len(frame) for frame in frames)
+            while sent:
+                size=len(self.outbox[0])
+                if sent<size:
+                    self.outbox[0]=memoryview(self.outbox[0])[sent:]
+                    break
+                self.outbox.popleft()
+                sent-=size
+            if not drained:
+                return False
+        return True
@@ -0,0 +1,37 @@
+from typing import Callable
+from config import Config
+from message import Message
+class Dispatcher:
+    def __init__(self,config:Config,kind_of:Callable[[Message],str],report:Callable[[Message,str],None]):
+        self.config=config
+        self.kind_of=kind_of
+        self.report=report
+        self.message_types=frozenset(vars(config.message_type).values())
+        self.handlers:dict[tuple[str,str,str|None],Callable]={}
+        self.registered:set[tuple[str,str]]=set()
+        self.rejected:dict[str,str]={}
+    def register(self,msg_type,instruction,handler:Callable,kind:str|None=None):
+        self.handlers[(msg_type,instruction,kind)]=handler
+        self.registered.add((msg_type,instruction))
+    def reject(self,msg_type,error_type):
+        self.rejected[msg_type]=error_type
+    def error(self,error_type)->Callable:
+        return lambda message,*args:self.report(message,error_type)
+    def dispatch(self,message:Message,*args):
+        handler=self.handlers.get((message.type,message.instruction,self.kind_of(message)))
+        if handler is None:
+            handler=self.handlers.get((message.type,message.instruction,None))
+        if handler is None:
+            self.report(message,self.classify(message))
+        else:
+            handler(message,*args)
+    def classify(self,message:Message)->str:
+        if message.type in self.rejected:
+            return self.rejected[message.type]
+        if message.type not in self.message_types:
+            return self.config.error.MessageTypeNotExist
+        if (message.type,message.instruction) in self.registered:
+            return self.config.error.WrongAddressee
+        if message.instruction in self.config.instruction.all:
+            return self.config.error.WrongInstruction
+        return self.config.error.InstructionNotExist
@@ -0,0 +1,101 @@
+import mmap
+import os
+import random
+import socket
+import struct
+import threading
+import zlib
+from message import HEADER
+MAGIC=0xC4
+CHUNK=struct.Struct('!BIQI')
+class FileTransfer:
+    @staticmethod
+    def is_chunk(payload:bytes)->bool:
+        return len(payload)>=CHUNK.size and payload[0]==MAGIC
+    @staticmethod
+    def transfer_of(payload:bytes)->int:
+        return CHUNK.unpack_from(payload,0)[1]
+    @staticmethod
+    def is_header(content)->bool:
+        return type(content)==dict and 'transfer' in content and 'size' in content
+    @staticmethod
+    def is_rewind(content)->bool:
+        return type(content)==dict and 'transfer' in content and 'size' not in content
+class OutgoingFile:
+    def __init__(self,path:str,addressee:str,chunk_size:int):
+        self.path=path
+        self.addressee=addressee
+        self.number=random.getrandbits(32)
+        self.size=os.path.getsize(path)
+        self.chunk_size=chunk_size
+        self.offset=0
+        self.streaming=False
+    def header(self)->dict:
+        return {
+            'transfer':self.number,
+            'filename':os.path.basename(self.path),
+            'size':self.size,
+            'offset':self.offset
+        }
+    def rewind(self,offset:int):
+        self.offset=min(max(offset,0),self.size)
+    def stream(self,the_socket:socket.socket,lock:threading.Lock):
+        with open(self.path,'rb') as file:
+            if not self.size:
+                return
+            with mmap.mmap(file.fileno(),0,access=mmap.ACCESS_READ) as mapped,memoryview(mapped) as view:
+                while self.offset<self.size:
+                    offset=self.offset
+                    count=min(self.chunk_size,self.size-offset)
+                    checksum=zlib.crc32(view[offset:offset+count])
+                    with lock:
+                        the_socket.sendall(HEADER.pack(CHUNK.size+count)+CHUNK.pack(MAGIC,self.number,offset,checksum))
+                        the_socket.sendfile(file,offset,count)
+                    if self.offset==offset:
+                        self.offset=offset+count
+    def frames(self):
+        with open(self.path,'rb') as file:
+            if not self.size:
+                return
+            with mmap.mmap(file.fileno(),0,access=mmap.ACCESS_READ) as mapped:
+                while self.offset<self.size:
+                    offset=self.offset
+                    data=mapped[offset:offset+min(self.chunk_size,self.size-offset)]
+                    yield HEADER.pack(CHUNK.size+len(data))+CHUNK.pack(MAGIC,self.number,offset,zlib.crc32(data))+data
+                    if self.offset==offset:
+                        self.offset=offset+len(data)
+class IncomingFile:
+    def __init__(self,number:int,path:str,size:int,sender:str):
+        self.number=number
+        self.path=path
+        self.size=size
+        self.sender=sender
+        self.received=0
+        self.rewind_requested:int|None=None
+        self.file=open(path,'r+b' if os.path.exists(path) else 'w+b')
+        self.file.truncate(size)
+        self.mapped=mmap.mmap(self.file.fileno(),size) if size else None
+    def expect(self,offset:int)->int|None:
+        if offset==self.received or self.rewind_requested==self.received:
+            return None
+        self.rewind_requested=self.received
+        return self.received
+    def resume(self)->int:
+        self.rewind_requested=self.received
+        return self.received
+    def write(self,payload:bytes)->int|None:
+        _,_,offset,checksum=CHUNK.unpack_from(payload,0)
+        data=memoryview(payload)[CHUNK.size:]
+        if offset!=self.received or zlib.crc32(data)!=checksum or offset+len(data)>self.size:
+            return self.expect(-1)
+        self.mapped[offset:offset+len(data)]=data
+        self.received+=len(data)
+        self.rewind_requested=None
+        return None
+    def complete(self)->bool:
+        return self.received>=self.size
+    def close(self):
+        if self.mapped is not None:
+            self.mapped.flush()
+            self.mapped.close()
+        self.file.close()
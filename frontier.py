@@ -0,0 +1,138 @@
+import hashlib
+import heapq
+import itertools
+import math
+import random
+import threading
+import time
+from typing import Callable
+from urllib.parse import urlsplit
+from spider import Spider
+class BloomFilter:
+    def __init__(self,capacity=10000000,error_rate=0.01):
+        self.size=max(8,int(-capacity*math.log(error_rate)/math.log(2)**2))
+        self.hashes=max(1,round(self.size/capacity*math.log(2)))
+        self.bits=bytearray((self.size+7)//8)
+        self.count=0
+    def positions(self,item:str):
+        digest=hashlib.blake2b(item.encode(),digest_size=16).digest()
+        first=int.from_bytes(digest[:8],'little')
+        second=int.from_bytes(digest[8:],'little')|1
+        return ((first+index*second)%self.size for index in range(self.hashes))
+    def add(self,item:str)->bool:
+        added=False
+        for position in self.positions(item):
+            mask=1<<(position&7)
+            if not self.bits[position>>3]&mask:
+                self.bits[position>>3]|=mask
+                added=True
+        self.count+=added
+        return added
+    def __contains__(self,item:str)->bool:
+        return all(self.bits[position>>3]&(1<<(position&7)) for position in self.positions(item))
+class HostBucket:
+    def __init__(self,host:str,delay:float,concurrency:int,user_agents:list,proxies:list):
+        self.host=host
+        self.delay=delay
+        self.concurrency=concurrency
+        self.queue:list[tuple[int,int,str]]=[]
+        self.active=0
+        self.ready=0.0
+        self.scheduled=False
+        self.user_agents=itertools.cycle(random.sample(user_agents,len(user_agents))) if user_agents else None
+        self.proxies=itertools.cycle(random.sample(proxies,len(proxies))) if proxies else None
+    def available(self)->bool:
+        return bool(self.queue) and self.active<self.concurrency and not self.scheduled
+    def identity(self)->tuple:
+        return (
+            next(self.user_agents) if self.user_agents else None,
+            next(self.proxies) if self.proxies else None
+        )
+class Frontier:
+    def __init__(self,spider:Spider,delay=1.0,per_host=2,capacity=10000000,error_rate=0.01):
+        self.spider=spider
+        self.delay=delay
+        self.per_host=per_host
+        self.seen=BloomFilter(capacity,error_rate)
+        self.hosts:dict[str,HostBucket]={}
+        self.ready:list[tuple[float,int,int,str]]=[]
+        self.counter=itertools.count()
+        self.condition=threading.Condition()
+        self.active=0
+        self.running=True
+    def bucket(self,host:str)->HostBucket:
+        bucket=self.hosts.get(host)
+        if bucket is None:
+            bucket=HostBucket(host,self.delay,self.per_host,self.spider.user_agents,self.spider.proxies)
+            self.hosts[host]=bucket
+        return bucket
+    def schedule(self,bucket:HostBucket):
+        if bucket.available():
+            bucket.scheduled=True
+            heapq.heappush(self.ready,(bucket.ready,bucket.queue[0][0],next(self.counter),bucket.host))
+            self.condition.notify()
+    def add(self,url:str,priority=0)->bool:
+        with self.condition:
+            if not self.seen.add(url):
+                return False
+            bucket=self.bucket(urlsplit(url).netloc)
+            heapq.heappush(bucket.queue,(priority,next(self.counter),url))
+            self.schedule(bucket)
+            return True
+    def take(self)->tuple[HostBucket,str,tuple]|None:
+        with self.condition:
+            while self.running:
+                if not self.ready:
+                    if not self.active:
+                        return None
+                    self.condition.wait()
+                    continue
+                ready,_,_,host=self.ready[0]
+                delay=ready-time.monotonic()
+                if delay>0:
+                    self.condition.wait(delay)
+                    continue
+                heapq.heappop(self.ready)
+                bucket=self.hosts[host]
+                bucket.scheduled=False
+                _,_,url=heapq.heappop(bucket.queue)
+                bucket.active+=1
+                bucket.ready=time.monotonic()+bucket.delay
+                self.active+=1
+                self.schedule(bucket)
+                return bucket,url,bucket.identity()
+            return None
+    def done(self,bucket:HostBucket):
+        with self.condition:
+            bucket.active-=1
+            self.active-=1
+            self.schedule(bucket)
+            if not self.active and not self.ready:
+                self.condition.notify_all()
+    def work(self,handler:Callable|None,other,cookies,return_bytes):
+        while True:
+            task=self.take()
+            if task is None:
+                return
+            bucket,url,(user_agent,proxy)=task
+            try:
+                result=self.spider.spider(url,other,cookies,return_bytes=return_bytes,user_agent=user_agent,proxy=proxy)
+                if handler is not None:
+                    handler(url,result,self)
+            except Exception as error:
+                print(f'An error occurs:{error}')
+            finally:
+                self.done(bucket)
+    def run(self,handler:Callable|None=None,workers=16,other=None,cookies=None,return_bytes=False):
+        threads=[
+            threading.Thread(target=self.work,args=(handler,other,cookies,return_bytes),daemon=True)
+            for _ in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    def stop(self):
+        with self.condition:
+            self.running=False
+            self.condition.notify_all()
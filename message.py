@@ -1,5 +1,41 @@
 import json
+import struct
+HEADER=struct.Struct('!I')
+TEMPLATE=frozenset({"type","instruction","sender","addressee","content"})
 class Message:
+    __slots__=('type','instruction','sender','addressee','content','raw')
+    def __init__(self,msg_type,instruction,sender,addressee,content='',raw:bytes|None=None):
+        self.type=msg_type
+        self.instruction=instruction
+        self.sender=sender
+        self.addressee=addressee
+        self.content=content
+        self.raw=raw
+    @staticmethod
+    def decode(payload:bytes)->'Message|None':
+        try:
+            dictionary=json.loads(payload)
+        except (json.JSONDecodeError,UnicodeDecodeError):
+            return None
+        if type(dictionary)!=dict or dictionary.keys()!=TEMPLATE:
+            return None
+        if any(type(dictionary[key])!=str for key in ('type','instruction','sender','addressee')):
+            return None
+        return Message(
+            dictionary['type'],
+            dictionary['instruction'],
+            dictionary['sender'],
+            dictionary['addressee'],
+            dictionary['content'],
+            bytes(payload)
+        )
+    def encode(self)->bytes:
+        if self.raw is None:
+            self.raw=Message.dump(self.type,self.instruction,self.sender,self.addressee,self.content)
+        return self.raw
+    @staticmethod
+    def frame(payload:bytes)->bytes:
+        return HEADER.pack(len(payload))+payload
     @staticmethod
     def dump(msg_type,instruction,sender,addressee,content)->bytes:
         dictionary={
@@ -15,7 +51,6 @@ class Message:
         return json.dumps(dictionary).encode()
     @staticmethod
     def is_message(message)->bool:
-        TEMPLATE={"type","instruction","sender","addressee","content"}
         try:
             dictionary:dict=json.loads(message)
             return set(dictionary.keys())==TEMPLATE
@@ -26,4 +61,43 @@ class Message:
         if Message.is_message(message):
             return json.loads(message)
         else:
-            return None 
+            return None
+class FrameDecoder:
+    def __init__(self,chunk_size:int,maximum_frame_limit:int):
+        self.chunk=bytearray(chunk_size)
+        self.view=memoryview(self.chunk)
+        self.buffer=bytearray()
+        self.maximum_frame_limit=maximum_frame_limit
+    def recv_frames(self,the_socket)->list[bytes]|None:
+        size=the_socket.recv_into(self.chunk)
+        if not size:
+            return None
+        frames=self.feed(self.view[:size])
+        pending=getattr(the_socket,'pending',None)
+        while pending is not None and pending():
+            size=the_socket.recv_into(self.chunk)
+            if not size:
+                break
+            frames+=self.feed(self.view[:size])
+        return frames
+    def feed(self,data)->list[bytes]:
+        if self.buffer:
+            self.buffer+=data
+            data=self.buffer
+        frames=[]
+        with memoryview(data) as view:
+            offset=0
+            while len(view)-offset>=HEADER.size:
+                (length,)=HEADER.unpack_from(view,offset)
+                if length>self.maximum_frame_limit:
+                    raise ValueError(f'Frame exceeds the limit:{length}')
+                end=offset+HEADER.size+length
+                if end>len(view):
+                    break
+                frames.append(bytes(view[offset+HEADER.size:end]))
+                offset=end
+            if data is not self.buffer:
+                self.buffer+=view[offset:]
+        if data is self.buffer:
+            del self.buffer[:offset]
+        return frames
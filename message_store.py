@@ -0,0 +1,186 @@
+import collections
+import mmap
+import os
+import struct
+import time
+RECORD=struct.Struct('!IBdH')
+ACKED=struct.Struct('!QQ')
+MESSAGE=0
+ACK=1
+class Segment:
+    def __init__(self,path:str,size:int):
+        self.path=path
+        self.number=int(os.path.basename(path).split('.')[0])
+        exists=os.path.exists(path)
+        self.file=open(path,'r+b' if exists else 'w+b')
+        if not exists:
+            self.file.truncate(size)
+        self.size=os.path.getsize(path)
+        self.mapped=mmap.mmap(self.file.fileno(),self.size)
+        self.position=0
+        self.synced=0
+        self.modified=os.path.getmtime(path)
+    def records(self):
+        position=0
+        while position+RECORD.size<=self.size:
+            length,kind,timestamp,name_length=RECORD.unpack_from(self.mapped,position)
+            end=position+RECORD.size+length
+            if not length or end>self.size:
+                break
+            start=position+RECORD.size
+            yield position,kind,timestamp,bytes(self.mapped[start:start+name_length]).decode()
+            self.modified=timestamp
+            position=end
+        self.position=self.synced=position
+    def fits(self,count:int)->bool:
+        return self.position+RECORD.size+count<=self.size
+    def append(self,kind:int,timestamp:float,addressee:bytes,payload:bytes)->int:
+        position=self.position
+        start=position+RECORD.size
+        length=len(addressee)+len(payload)
+        self.mapped[start:start+len(addressee)]=addressee
+        self.mapped[start+len(addressee):start+length]=payload
+        RECORD.pack_into(self.mapped,position,length,kind,timestamp,len(addressee))
+        self.position=start+length
+        self.modified=timestamp
+        return position
+    def read(self,position:int)->bytes:
+        length,_,_,name_length=RECORD.unpack_from(self.mapped,position)
+        return bytes(self.mapped[position+RECORD.size+name_length:position+RECORD.size+length])
+    def sync(self):
+        start=self.synced-self.synced%mmap.ALLOCATIONGRANULARITY
+        if self.position>start:
+            self.mapped.flush(start,self.position-start)
+            self.synced=self.position
+    def close(self):
+        self.sync()
+        self.mapped.close()
+        self.file.close()
+    def remove(self):
+        self.mapped.close()
+        self.file.close()
+        os.remove(self.path)
+class MessageStore:
+    def __init__(self,directory:str,segment_size:int,sync_interval:float,sync_batch:int,retention_bytes:int,retention_age:float):
+        self.directory=directory
+        self.segment_size=segment_size
+        self.sync_interval=sync_interval
+        self.sync_batch=sync_batch
+        self.retention_bytes=retention_bytes
+        self.retention_age=retention_age
+        self.segments:list[Segment]=[]
+        self.index:dict[str,collections.deque[tuple[Segment,int]]]={}
+        self.dirty:set[Segment]=set()
+        self.unsynced=0
+        self.synced=time.monotonic()
+        os.makedirs(directory,exist_ok=True)
+        self.tokens=self.load_tokens()
+        self.tokens_file=open(os.path.join(directory,'tokens'),'a')
+        names=[name for name in os.listdir(directory) if name.endswith('.log') and name[:-4].isdigit()]
+        for name in sorted(names,key=lambda name:int(name[:-4])):
+            segment=Segment(os.path.join(directory,name),segment_size)
+            self.segments.append(segment)
+            for position,kind,_,addressee in segment.records():
+                if kind==MESSAGE:
+                    self.index.setdefault(addressee,collections.deque()).append((segment,position))
+                else:
+                    payload=segment.read(position)
+                    self.discard(addressee,ACKED.unpack(payload) if len(payload)==ACKED.size else None)
+        self.expire(time.time())
+    def load_tokens(self)->dict[str,str]:
+        path=os.path.join(self.directory,'tokens')
+        tokens={}
+        if os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    addressee,_,digest=line.rstrip('\n').rpartition(' ')
+                    if addressee and digest:
+                        tokens[addressee]=digest
+                    elif addressee:
+                        tokens.pop(addressee,None)
+        with open(path+'.tmp','w') as file:
+            file.writelines(f'{addressee} {digest}\n' for addressee,digest in tokens.items())
+        os.replace(path+'.tmp',path)
+        return tokens
+    def remember(self,addressee:str,digest:str):
+        self.tokens[addressee]=digest
+        self.write_token(f'{addressee} {digest}\n')
+    def write_token(self,line:str):
+        self.tokens_file.write(line)
+        self.unsynced+=1
+        if self.unsynced>=self.sync_batch:
+            self.sync()
+    def forget(self,addressee:str):
+        if self.tokens.pop(addressee,None) is not None:
+            self.write_token(f'{addressee} \n')
+    def addressees(self)->set[str]:
+        return set(self.index)
+    def pending(self,addressee:str)->int:
+        return len(self.index.get(addressee,()))
+    def active(self,count:int)->Segment:
+        if not self.segments or not self.segments[-1].fits(count):
+            number=self.segments[-1].number+1 if self.segments else 0
+            path=os.path.join(self.directory,f'{number:020d}.log')
+            self.segments.append(Segment(path,max(self.segment_size,RECORD.size+count)))
+        return self.segments[-1]
+    def write(self,kind:int,addressee:str,payload:bytes)->tuple[Segment,int]:
+        name=addressee.encode()
+        segment=self.active(len(name)+len(payload))
+        position=segment.append(kind,time.time(),name,payload)
+        self.dirty.add(segment)
+        self.unsynced+=1
+        if self.unsynced>=self.sync_batch:
+            self.sync()
+        return segment,position
+    def append(self,addressee:str,payload:bytes):
+        self.index.setdefault(addressee,collections.deque()).append(self.write(MESSAGE,addressee,payload))
+    def replay(self,addressee:str):
+        for segment,position in self.index.get(addressee,()):
+            yield segment.read(position)
+    def discard(self,addressee:str,through:tuple[int,int]|None=None):
+        entries=self.index.get(addressee)
+        if entries is None:
+            return
+        while entries and (through is None or (entries[0][0].number,entries[0][1])<=through):
+            entries.popleft()
+        if not entries:
+            del self.index[addressee]
+    def ack(self,addressee:str,count:int|None=None):
+        entries=self.index.get(addressee)
+        if entries is None:
+            return
+        if count is None or count>=len(entries):
+            self.discard(addressee)
+            self.write(ACK,addressee,b'')
+            return
+        segment,position=entries[count-1]
+        self.discard(addressee,(segment.number,position))
+        self.write(ACK,addressee,ACKED.pack(segment.number,position))
+    def sync(self):
+        self.tokens_file.flush()
+        for segment in self.dirty:
+            segment.sync()
+        self.dirty.clear()
+        self.unsynced=0
+        self.synced=time.monotonic()
+    def tick(self,now:float):
+        if now-self.synced>=self.sync_interval:
+            self.sync()
+            self.expire(time.time())
+    def expire(self,now:float):
+        total=sum(segment.size for segment in self.segments)
+        while len(self.segments)>1 and (total>self.retention_bytes or now-self.segments[0].modified>self.retention_age):
+            segment=self.segments.pop(0)
+            total-=segment.size
+            self.dirty.discard(segment)
+            for addressee,entries in list(self.index.items()):
+                while entries and entries[0][0] is segment:
+                    entries.popleft()
+                if not entries:
+                    del self.index[addressee]
+            segment.remove()
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments.clear()
+        self.tokens_file.close()
@@ -0,0 +1,49 @@
+import collections
+import json
+import time
+class Histogram:
+    def __init__(self):
+        self.buckets=[0]*64
+        self.count=0
+        self.total=0
+    def observe(self,value:int):
+        self.buckets[min(value.bit_length(),63)]+=1
+        self.count+=1
+        self.total+=value
+    def quantile(self,fraction:float)->int:
+        rank=fraction*self.count
+        seen=0
+        for index,amount in enumerate(self.buckets):
+            seen+=amount
+            if amount and seen>=rank:
+                return (1<<index)-1 if index else 0
+        return 0
+    def snapshot(self)->dict:
+        return {
+            'count':self.count,
+            'mean':self.total/self.count if self.count else 0,
+            'p50':self.quantile(0.5),
+            'p99':self.quantile(0.99),
+            'max':self.quantile(1.0)
+        }
+class Metrics:
+    def __init__(self,enabled:bool):
+        self.enabled=enabled
+        self.started=time.time()
+        self.counters:collections.Counter[str]=collections.Counter()
+        self.histograms:dict[str,Histogram]=collections.defaultdict(Histogram)
+    def count(self,name:str,amount:int=1):
+        self.counters[name]+=amount
+    def observe(self,name:str,start:float):
+        self.histograms[name].observe(int((time.perf_counter()-start)*1000000))
+    def record(self,name:str,value:int):
+        self.histograms[name].observe(value)
+    def snapshot(self,gauges:dict|None=None)->dict:
+        return {
+            'uptime':time.time()-self.started,
+            'gauges':gauges or {},
+            'counters':dict(self.counters),
+            'histograms':{name:histogram.snapshot() for name,histogram in self.histograms.items()}
+        }
+    def dumps(self,gauges:dict|None=None)->bytes:
+        return json.dumps(self.snapshot(gauges)).encode()
@@ -0,0 +1,172 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+class CachedResponse:
+    __slots__=('status','headers','content','encoding','stored','expires')
+    def __init__(self,status:int,headers:dict,content:bytes,encoding:str|None,stored:float,expires:float):
+        self.status=status
+        self.headers=headers
+        self.content=content
+        self.encoding=encoding
+        self.stored=stored
+        self.expires=expires
+    @property
+    def text(self)->str:
+        return self.content.decode(self.encoding or 'utf-8',errors='replace')
+    def fresh(self,now:float)->bool:
+        return now<self.expires
+    def validators(self)->dict:
+        headers={}
+        if 'Etag' in self.headers:
+            headers['If-None-Match']=self.headers['Etag']
+        if 'Last-Modified' in self.headers:
+            headers['If-Modified-Since']=self.headers['Last-Modified']
+        return headers
+    def meta(self)->dict:
+        return {
+            'status':self.status,
+            'headers':self.headers,
+            'encoding':self.encoding,
+            'stored':self.stored,
+            'expires':self.expires
+        }
+class ResponseCache:
+    def __init__(self,directory=None,memory_limit=64*1024*1024,disk_limit=1024*1024*1024,max_age=86400.0,default_ttl=0.0):
+        self.directory=directory
+        self.memory_limit=memory_limit
+        self.disk_limit=disk_limit
+        self.max_age=max_age
+        self.default_ttl=default_ttl
+        self.memory:collections.OrderedDict[str,CachedResponse]=collections.OrderedDict()
+        self.memory_size=0
+        self.disk:collections.OrderedDict[str,int]=collections.OrderedDict()
+        self.disk_size=0
+        self.lock=threading.Lock()
+        if directory:
+            os.makedirs(directory,exist_ok=True)
+            bodies=[entry for entry in os.scandir(directory) if entry.name.endswith('.body')]
+            for entry in sorted(bodies,key=lambda entry:entry.stat().st_mtime):
+                self.disk[entry.name[:-5]]=entry.stat().st_size
+                self.disk_size+=entry.stat().st_size
+    @staticmethod
+    def key(method,url,params=None)->str:
+        items=sorted(params.items()) if type(params)==dict else params
+        return hashlib.sha256(json.dumps([method,url,items],default=str).encode()).hexdigest()
+    @staticmethod
+    def normalize(headers)->dict:
+        return {name.title():value for name,value in headers.items()}
+    @staticmethod
+    def directives(headers)->dict:
+        directives={}
+        for item in headers.get('Cache-Control','').split(','):
+            name,_,value=item.strip().partition('=')
+            if name:
+                directives[name.lower()]=value.strip('"')
+        return directives
+    def lifetime(self,headers)->float|None:
+        directives=ResponseCache.directives(headers)
+        if 'no-store' in directives:
+            return None
+        if 'no-cache' in directives:
+            return 0.0
+        for name in ('s-maxage','max-age'):
+            if directives.get(name,'').isdigit():
+                return float(directives[name])
+        if 'Expires' in headers:
+            try:
+                return max(parsedate_to_datetime(headers['Expires']).timestamp()-time.time(),0.0)
+            except (TypeError,ValueError):
+                return 0.0
+        return self.default_ttl
+    def get(self,key:str)->CachedResponse|None:
+        with self.lock:
+            entry=self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+            elif key in self.disk:
+                entry=self.load(key)
+        if entry is not None and time.time()-entry.stored>self.max_age and not entry.validators():
+            self.discard(key)
+            return None
+        return entry
+    def put(self,key:str,response)->CachedResponse|None:
+        headers=ResponseCache.normalize(response.headers)
+        lifetime=self.lifetime(headers)
+        if lifetime is None:
+            self.discard(key)
+            return None
+        now=time.time()
+        entry=CachedResponse(response.status_code,headers,response.content,response.encoding,now,now+lifetime)
+        if lifetime or entry.validators():
+            self.store(key,entry)
+        return entry
+    def refresh(self,key:str,entry:CachedResponse,response)->CachedResponse:
+        headers=dict(entry.headers)
+        headers.update({name:value for name,value in ResponseCache.normalize(response.headers).items() if name in ('Etag','Last-Modified','Cache-Control','Expires','Date')})
+        lifetime=self.lifetime(headers)
+        now=time.time()
+        entry=CachedResponse(entry.status,headers,entry.content,entry.encoding,now,now+(lifetime or 0.0))
+        self.store(key,entry)
+        return entry
+    def store(self,key:str,entry:CachedResponse):
+        with self.lock:
+            self.remember(key,entry)
+            if self.directory:
+                self.save(key,entry)
+    def remember(self,key:str,entry:CachedResponse):
+        previous=self.memory.pop(key,None)
+        if previous is not None:
+            self.memory_size-=len(previous.content)
+        if len(entry.content)>self.memory_limit:
+            return
+        self.memory[key]=entry
+        self.memory_size+=len(entry.content)
+        while self.memory_size>self.memory_limit:
+            _,evicted=self.memory.popitem(last=False)
+            self.memory_size-=len(evicted.content)
+    def path(self,key:str,suffix:str)->str:
+        return os.path.join(self.directory,key+suffix)
+    def save(self,key:str,entry:CachedResponse):
+        with open(self.path(key,'.json'),'w') as file:
+            json.dump(entry.meta(),file)
+        with open(self.path(key,'.body'),'wb') as file:
+            file.write(entry.content)
+        self.disk_size+=len(entry.content)-self.disk.pop(key,0)
+        self.disk[key]=len(entry.content)
+        now=time.time()
+        while self.disk and (self.disk_size>self.disk_limit or now-os.path.getmtime(self.path(next(iter(self.disk)),'.body'))>self.max_age):
+            oldest=next(iter(self.disk))
+            if oldest==key:
+                break
+            self.remove(oldest)
+    def load(self,key:str)->CachedResponse|None:
+        try:
+            with open(self.path(key,'.json')) as file:
+                meta=json.load(file)
+            with open(self.path(key,'.body'),'rb') as file:
+                content=file.read()
+        except (OSError,ValueError):
+            self.remove(key)
+            return None
+        entry=CachedResponse(meta['status'],meta['headers'],content,meta['encoding'],meta['stored'],meta['expires'])
+        self.disk.move_to_end(key)
+        self.remember(key,entry)
+        return entry
+    def remove(self,key:str):
+        self.disk_size-=self.disk.pop(key,0)
+        for suffix in ('.json','.body'):
+            try:
+                os.remove(self.path(key,suffix))
+            except OSError:
+                pass
+    def discard(self,key:str):
+        with self.lock:
+            entry=self.memory.pop(key,None)
+            if entry is not None:
+                self.memory_size-=len(entry.content)
+            if self.directory and key in self.disk:
+                self.remove(key)
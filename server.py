@@ -1,7 +1,10 @@
+from config_manager import ConfigManager
 from server_socket import ServerSocket
 from thread_manager import ThreadManager
 class Server:
     def __init__(self):
+        ConfigManager.install_signal_handler()
+        ConfigManager.watch()
         self.socket=ServerSocket()
         self.thread=ThreadManager(self.socket)
-        self.thread.start_threads(self.socket.accept,self.socket.receive)
+        self.thread.start_threads(self.socket.poll)
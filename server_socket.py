@@ -1,164 +1,576 @@
+import hashlib
+import hmac
+import secrets
+import selectors
 import socket
+import ssl
+import threading
+import time
+from codec import Codec
 from config import Config
-from message import Message
+from config_manager import ConfigManager
+from connection import WOULD_BLOCK,Connection
+from dispatcher import Dispatcher
+from file_transfer import FileTransfer
+from message import FrameDecoder,Message
+from message_store import MessageStore
+from metrics import Metrics
+from timer_wheel import TimerWheel
+from tls import Tls
 class ServerSocket:
-    def __init__(self):
-        self.config=Config()
+    reuse_port=False
+    def __init__(self,config:Config|None=None):
+        self.config=config if config else ConfigManager.snapshot()
+        self.selector=selectors.DefaultSelector()
+        self.ssl_context=Tls.server_context(self.config)
         self._init_socket()
         self.current_give_id=1
-        self.clients_dict:dict[str,socket.socket]={}
+        self.clients_dict:dict[str,Connection]={}
         self.address_dict={}
+        self.groups_dict:dict[str,set[str]]={}
+        self.wheel=TimerWheel(self.config.wheel_slots,self.config.wheel_tick)
+        self._init_dispatcher()
+        self.metrics=Metrics(self.config.metrics_enabled)
+        self.metrics_dumped=time.monotonic()
+        self._init_metrics()
+        self.known_ids:set[str]=set()
+        self.tokens:dict[str,str]={}
+        self.departures=TimerWheel(self.config.wheel_slots,self.config.wheel_tick)
+        self.replaying:set[Connection]=set()
+        self._init_store()
         self.running=True
+        if config is None:
+            ConfigManager.subscribe(self.reconfigure)
     def _init_socket(self):
         self.socket=socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEADDR,1)
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEPORT,1)
         self.socket.bind((self.config.host,self.config.port))
-        self.socket.listen()
+        self.socket.listen(self.config.backlog)
+        self.socket.setblocking(False)
+        self.selector.register(self.socket,selectors.EVENT_READ)
+    def _init_metrics(self):
+        self.metrics_socket=None
+        if self.metrics.enabled and self.metrics_port():
+            self.metrics_socket=socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+            self.metrics_socket.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEADDR,1)
+            self.metrics_socket.bind((self.config.metrics_host,self.metrics_port()))
+            self.metrics_socket.listen()
+            self.metrics_socket.setblocking(False)
+            self.selector.register(self.metrics_socket,selectors.EVENT_READ,self.metrics)
+    def metrics_port(self)->int:
+        return self.config.metrics_port
+    def _init_store(self):
+        self.store=None
+        if self.config.store_enabled:
+            self.store=MessageStore(
+                self.store_dir(),
+                self.config.store_segment_size,
+                self.config.store_sync_interval,
+                self.config.store_sync_batch,
+                self.config.store_retention_bytes,
+                self.config.store_retention_age
+            )
+            self.known_ids.update(self.store.addressees())
+            self.known_ids.update(self.store.tokens)
+            self.tokens.update(self.store.tokens)
+            for id in self.known_ids:
+                self.departures.schedule(id,self.config.store_retention_age)
+    def store_dir(self)->str:
+        return ConfigManager.resolve(self.config.store_dir)
+    def reconfigure(self,config:Config):
+        self.config=config
+        self._init_dispatcher()
     def close(self):
         self.running=False
+        ConfigManager.unsubscribe(self.reconfigure)
+        for connection in list(self.clients_dict.values()):
+            self.disconnect(connection)
+        self.selector.close()
         self.socket.close()
-        for clients_socket in self.clients_dict.values():
-            clients_socket.close()
-    def accept(self):
+        if self.metrics_socket is not None:
+            self.metrics_socket.close()
+        if self.store is not None:
+            self.store.close()
+    def poll(self):
+        if not self.running:
+            return
+        events=self.selector.select(self.config.select_timeout)
+        if not self.running:
+            return
+        for key,mask in events:
+            connection:Connection=key.data
+            if connection is None:
+                self.accept()
+                continue
+            if connection is self.metrics:
+                self.serve_metrics()
+                continue
+            if connection.handshaking:
+                self.handshake(connection)
+                continue
+            if mask&selectors.EVENT_READ:
+                self.receive(connection)
+            if mask&selectors.EVENT_WRITE and connection.socket.fileno()>=0:
+                self.flush(connection)
+        self.reap()
+    def reap(self):
+        now=time.monotonic()
+        for connection in self.wheel.advance(now):
+            idle=now-connection.last_seen
+            if connection.blocked_by:
+                self.wheel.schedule(connection,self.config.idle_timeout)
+            elif idle<self.config.idle_timeout:
+                self.wheel.schedule(connection,self.config.idle_timeout-idle)
+            elif not connection.probed:
+                connection.probed=True
+                self.heartbeat_detection(connection.id,self.config.probe_content)
+                self.wheel.schedule(connection,self.config.probe_grace)
+            else:
+                print(f'Client {connection.id} timed out')
+                if self.metrics.enabled:
+                    self.metrics.count('idle_evictions')
+                self.disconnect(connection)
+        for id in self.departures.advance(now):
+            self.expire(id)
+        if self.store is not None:
+            self.store.tick(now)
+            for connection in list(self.replaying):
+                if not connection.writing:
+                    self.replay(connection)
+        if self.metrics.enabled and self.config.metrics_dump_interval and now-self.metrics_dumped>=self.config.metrics_dump_interval:
+            self.metrics_dumped=now
+            with open(self.config.metrics_dump_file,'wb') as file:
+                file.write(self.metrics.dumps(self.gauges()))
+    def gauges(self)->dict:
+        connections=list(self.clients_dict.values())
+        return {
+            'connections':len(connections),
+            'groups':len(self.groups_dict),
+            'queued_bytes':sum(connection.outbox_bytes for connection in connections),
+            'queued_frames':sum(len(connection.outbox) for connection in connections)
+        }
+    def serve_metrics(self):
+        try:
+            stats_socket,_=self.metrics_socket.accept()
+        except BlockingIOError:
+            return
+        threading.Thread(target=self.send_metrics,args=(stats_socket,self.metrics.dumps(self.gauges())),daemon=True).start()
+    def send_metrics(self,stats_socket:socket.socket,data:bytes):
         try:
-            client_socket,address=self.socket.accept()
+            stats_socket.settimeout(self.config.select_timeout)
+            stats_socket.sendall(data)
+        except socket.error as error:
+            print(f'Error serving metrics:{error}')
+        finally:
+            stats_socket.close()
+    def touch(self,connection:Connection):
+        connection.last_seen=time.monotonic()
+        connection.probed=False
+    def accept(self):
+        while True:
+            try:
+                client_socket,address=self.socket.accept()
+            except BlockingIOError:
+                break
+            except socket.error as error:
+                print(f'Error accepting client connection:{error}')
+                break
             print(f'A client socket, from {address}, connect to server...')
-            if address not in self.address_dict:
+            client_socket.setblocking(False)
+            if self.ssl_context is not None:
+                client_socket=self.ssl_context.wrap_socket(client_socket,server_side=True,do_handshake_on_connect=False)
+            connection=self.register(client_socket,address)
+            self.selector.register(client_socket,selectors.EVENT_READ,connection)
+            if self.ssl_context is not None:
+                connection.handshaking=True
+                self.handshake(connection)
+    def handshake(self,connection:Connection):
+        try:
+            connection.socket.do_handshake()
+        except ssl.SSLWantReadError:
+            events=selectors.EVENT_READ
+        except ssl.SSLWantWriteError:
+            events=selectors.EVENT_READ|selectors.EVENT_WRITE
+        except (ssl.SSLError,socket.error) as error:
+            print(f'Error during TLS handshake:{error}')
+            self.disconnect(connection)
+            return
+        else:
+            connection.handshaking=False
+            connection.writing=bool(connection.outbox)
+            events=selectors.EVENT_READ|selectors.EVENT_WRITE if connection.writing else selectors.EVENT_READ
+        self.selector.modify(connection.socket,events,connection)
+        if not connection.handshaking and connection.socket.pending():
+            self.receive(connection)
+    def register(self,client_socket:socket.socket,address)->Connection:
+        if address in self.address_dict:
+            id=self.address_dict[address]
+        else:
+            id=self.allocate()
+            while id in self.known_ids:
                 id=self.allocate()
-                self.clients_dict[id]=client_socket
-                self.address_dict[address]=id
-        except socket.error as error:
-            print(f'Error accepting client connection:{error}')
+            self.address_dict[address]=id
+        connection=Connection(client_socket,address,id,self.decoder())
+        self.clients_dict[id]=connection
+        self.known_ids.add(id)
+        self.departures.cancel(id)
+        self.touch(connection)
+        self.wheel.schedule(connection,self.config.idle_timeout)
+        return connection
+    def join_group(self,group_id:str,client_id:str)->bool:
+        if client_id not in self.clients_dict or self.reserved(group_id):
+            return False
+        self.groups_dict.setdefault(group_id,set()).add(client_id)
+        self.clients_dict[client_id].groups.add(group_id)
+        return True
+    def reserved(self,id:str)->bool:
+        return id in self.known_ids or id in (self.config.server_id,self.config.broadcast_id) or id.startswith('id') and id[2:].isdigit()
+    def leave_group(self,group_id:str,client_id:str):
+        members=self.groups_dict.get(group_id)
+        if members is not None:
+            members.discard(client_id)
+            if not members:
+                del self.groups_dict[group_id]
+        if client_id in self.clients_dict:
+            self.clients_dict[client_id].groups.discard(group_id)
+    def decoder(self)->FrameDecoder:
+        return FrameDecoder(self.config.maximum_text_limit,self.config.maximum_frame_limit)
     def allocate(self)->str:
         id=self.current_give_id
         self.current_give_id+=1
         return 'id'+str(id)
-    def receive(self):
+    def forget(self,connection:Connection):
+        self.wheel.cancel(connection)
+        self.replaying.discard(connection)
+        self.release(connection)
+        for target in connection.blocked_by:
+            target.waiting.discard(connection)
+        connection.blocked_by.clear()
+        if self.clients_dict.get(connection.id) is connection:
+            del self.clients_dict[connection.id]
+            self.address_dict.pop(connection.address,None)
+            self.departures.schedule(connection.id,self.config.store_retention_age)
+            for group_id in list(connection.groups):
+                self.leave_group(group_id,connection.id)
+    def disconnect(self,connection:Connection):
+        self.forget(connection)
         try:
-            message=self.socket.recv(self.config.maximum_text_limit)
-            self.handle(Message.loads(message)) if Message.is_message(message) else None
-        except socket.error as error:
+            self.selector.unregister(connection.socket)
+        except (KeyError,ValueError):
+            pass
+        connection.socket.close()
+    def receive(self,connection:Connection):
+        try:
+            frames=connection.decoder.recv_frames(connection.socket)
+        except WOULD_BLOCK:
+            return
+        except (socket.error,ValueError) as error:
             print(f'Error receiving message:{error}')
+            self.disconnect(connection)
+            return
+        if frames is None:
+            self.disconnect(connection)
+            return
+        self.touch(connection)
+        metrics=self.metrics
+        for payload in frames:
+            if FileTransfer.is_chunk(payload):
+                if metrics.enabled:
+                    metrics.count('in.chunks')
+                    metrics.count('in.bytes',len(payload))
+                self.transfer(connection,payload)
+            elif not metrics.enabled:
+                self.handle(connection.codec.decode(payload),connection)
+            else:
+                start=time.perf_counter()
+                message=connection.codec.decode(payload)
+                metrics.observe('decode_us',start)
+                metrics.count('in.bytes',len(payload))
+                metrics.count('in.invalid' if message is None else self.in_names.get((message.type,message.instruction),'in.unknown'))
+                start=time.perf_counter()
+                self.handle(message,connection)
+                metrics.observe('handle_us',start)
+    def transfer(self,connection:Connection,payload:bytes):
+        header=connection.transfers.get(FileTransfer.transfer_of(payload))
+        if header is not None:
+            frame=Message.frame(payload)
+            for target in self.route(header) or []:
+                self.queue(target,frame)
+                if not self.has_room(target):
+                    self.pause(connection,target)
+    def pause(self,connection:Connection,target:Connection):
+        target.waiting.add(connection)
+        if not connection.blocked_by:
+            connection.blocked_by.add(target)
+            self.watch(connection)
+        connection.blocked_by.add(target)
+    def release(self,target:Connection):
+        target.over_limit_since=None
+        for connection in target.waiting:
+            connection.blocked_by.discard(target)
+            if not connection.blocked_by:
+                self.watch(connection)
+        target.waiting.clear()
+    def watch(self,connection:Connection):
+        events=(0 if connection.blocked_by else selectors.EVENT_READ)|(selectors.EVENT_WRITE if connection.writing else 0)
+        try:
+            if events:
+                self.selector.modify(connection.socket,events,connection)
+            else:
+                self.selector.unregister(connection.socket)
+        except KeyError:
+            if events:
+                self.selector.register(connection.socket,events,connection)
+    def track(self,message:Message,connection:Connection):
+        if message.instruction!=self.config.instruction.file:
+            return
+        if FileTransfer.is_header(message.content):
+            connection.transfers[message.content['transfer']]=message
+        elif FileTransfer.is_rewind(message.content) and message.addressee in self.clients_dict:
+            transfers=self.clients_dict[message.addressee].transfers
+            header=transfers.get(message.content['transfer'])
+            if header is not None and message.content.get('offset',0)>=header.content['size']:
+                del transfers[message.content['transfer']]
+    def queued(self,connection:Connection)->tuple[int,int]:
+        return connection.outbox_bytes,len(connection.outbox)
+    def has_room(self,connection:Connection,factor:int=1)->bool:
+        size,count=self.queued(connection)
+        return size<self.config.outbox_bytes_limit*factor and count<self.config.outbox_messages_limit*factor
+    def admit(self,connection:Connection,stateful:bool)->bool:
+        if self.has_room(connection):
+            connection.over_limit_since=None
+            return True
+        return self.slow_consumer(connection,stateful)
+    def write(self,connection:Connection,frame:bytes,stateful:bool=False):
+        if self.admit(connection,stateful):
+            self.queue(connection,frame)
+    def queue(self,connection:Connection,frame:bytes):
+        connection.enqueue(frame)
+        if self.metrics.enabled:
+            self.metrics.count('out.bytes',len(frame))
+            self.metrics.record('queue_depth',len(connection.outbox))
+        if not connection.writing:
+            self.flush(connection)
+    def slow_consumer(self,connection:Connection,stateful:bool)->bool:
+        now=time.monotonic()
+        if connection.over_limit_since is None:
+            connection.over_limit_since=now
+        if self.config.slow_consumer_policy=='disconnect':
+            if now-connection.over_limit_since<=self.config.slow_consumer_grace and self.has_room(connection,self.config.slow_consumer_hard_factor):
+                return True
+        elif not stateful:
+            connection.dropped+=1
+            if self.metrics.enabled:
+                self.metrics.count('dropped')
+            return False
+        print(f'Disconnecting slow client {connection.id}')
+        if self.metrics.enabled:
+            self.metrics.count('slow_evictions')
+        self.disconnect(connection)
+        return False
+    def flush(self,connection:Connection):
+        try:
+            drained=connection.flush(self.config.coalesce_limit)
+        except socket.error as error:
+            print(f'Error sending message to client {connection.id}:{error}')
+            if self.metrics.enabled:
+                self.metrics.count('send_errors')
+            self.disconnect(connection)
+            return
+        if drained:
+            connection.over_limit_since=None
+        if drained==connection.writing:
+            connection.writing=not drained
+            self.watch(connection)
+        if connection.waiting and self.has_room(connection):
+            self.release(connection)
     def error_report(self,addressee,error_type):
-        self.send(Message.dump(
+        self.send(Message(
             self.config.message_type.report,
             self.config.instruction.error,
             self.config.server_id,
             addressee,
             error_type
         ))
-    def heartbeat_detection(self,addressee):
-        self.send(Message.dump(
+    def heartbeat_detection(self,addressee,content=''):
+        self.send(Message(
             self.config.message_type.detection,
             self.config.instruction.detect,
-            addressee,
             self.config.server_id,
-            ''
+            addressee,
+            content
         ))
-    def send_respond(self,instruction,addressee):
-        self.send(Message.dump(
+    def send_respond(self,instruction,addressee,content=''):
+        self.send(Message(
             self.config.message_type.respond,
             instruction,
             self.config.server_id,
             addressee,
-            ''
+            content
         ))
-    def handle(self,dictionary):
-        if dictionary is not None and type(dictionary)==dict:
-            match dictionary['type']:
-                case self.config.message_type.transmit:
-                    match dictionary['instruction']:
-                        case instruction if instruction in {
-                            self.config.instruction.text,
-                            self.config.instruction.file
-                        }:
-                            self.send(Message.dumps(dictionary))
-                        case instruction if instruction in self.config.instruction.difference({
-                            self.config.instruction.text,
-                            self.config.instruction.file
-                        }):
-                            self.error_report(dictionary['sender'],self.config.error.WrongInstruction)
-                        case _:
-                            self.error_report(dictionary['sender'],self.config.error.InstructionNotExist)
-                case self.config.message_type.detection:
-                    match dictionary['instruction']:
-                        case self.config.instruction.detect:
-                            match dictionary['addressee']:
-                                case self.config.server_id:
-                                    self.heartbeat_detection(dictionary['sender'])
-                                case _:
-                                    self.error_report(dictionary['sender'],self.config.error.WrongAddressee)
-                        case instruction if instruction in self.config.instruction.difference({
-                            self.config.instruction.detect
-                        }):
-                            self.error_report(dictionary['sender'],self.config.error.WrongInstruction)
-                        case _:
-                            self.error_report(dictionary['sender'],self.config.error.InstructionNotExist)
-                case self.config.message_type.inquire:
-                    match dictionary['instruction']:
-                        case self.config.instruction.bye:
-                            self.send(Message.dumps(dictionary))
-                        case self.config.instruction.join:
-                            match dictionary['addressee']:
-                                case self.config.server_id:
-                                    self.send_respond(self.config.instruction.id,dictionary['sender'])
-                                case _:
-                                    self.error_report(dictionary['sender'],self.config.error.WrongAddressee)
-                        case self.config.instruction.call:
-                            match dictionary['addressee']:
-                                case self.config.server_id:
-                                    self.send_respond(self.config.instruction.known,dictionary['sender'])
-                                case _:
-                                    self.error_report(dictionary['sender'],self.config.error.WrongAddressee)
-                        case instruction if instruction in self.config.instruction.difference({
-                            self.config.instruction.bye,
-                            self.config.instruction.join,
-                            self.config.instruction.call
-                        }):
-                            self.error_report(dictionary['sender'],self.config.error.WrongInstruction)
-                        case _:
-                            self.error_report(dictionary['sender'],self.config.error.InstructionNotExist)
-                case self.config.message_type.respond:
-                    self.error_report(dictionary['sender'],self.config.error.WrongMessageType)
-                case self.config.message_type.report:
-                    match dictionary['instruction']:
-                        case self.config.instruction.error:
-                            match dictionary['addressee']:
-                                case self.config.server_id:
-                                    self.error_report(dictionary['sender'],self.config.error.WrongAddressee)
-                                case _:
-                                    self.send(Message.dumps(dictionary))
-                        case instruction if instruction in self.config.instruction.difference({
-                            self.config.instruction.error
-                        }):
-                            self.error_report(dictionary['sender'],self.config.error.WrongInstruction)
-                        case _:
-                            self.error_report(dictionary['sender'],self.config.error.InstructionNotExist)
-                case _:
-                    self.error_report(dictionary['sender'],self.config.error.MessageTypeNotExist)
-    def send(self,message):
-        dictionary=Message.loads(message)
-        if dictionary is not None:
-            try:
-                if dictionary['addressee']==self.config.broadcast_id:
-                    for client_id,client_socket in self.clients_dict.items():
-                        if client_id==dictionary['sender']:
-                            continue
-                        client_socket.sendall(message)
-                else:
-                    for id in self.clients_dict.keys():
-                        self.clients_dict[id].sendall(message)
-            except socket.error as error:
-                if dictionary['addressee']==self.config.broadcast_id:
-                    print(f'Error sending broadcast to client {client_id}:{error}')
-                    del self.clients_dict[client_id]
-                    self.error_sending(dictionary['sender'])
-                else:
-                    print(f'Error sending message to client {dictionary['addressee']}:{error}')
-                    del self.clients_dict[dictionary['addressee']]
-                    self.error_sending(dictionary['sender'])
+    def negotiate(self,connection:Connection,instruction,offered,content:dict):
+        codec=Codec.negotiate(offered.get('codecs') if type(offered)==dict else None,self.config)
+        content['codec']=codec.name
+        if type(offered)==dict:
+            compressed=Codec.compressed(codec,offered.get('compression'),self.config)
+            if compressed is not codec:
+                content['compression']=compressed.name
+                codec=compressed
+        self.send_respond(instruction,connection.id,content)
+        connection.codec=codec
+    def _init_dispatcher(self):
+        message_type=self.config.message_type
+        instruction=self.config.instruction
+        self.dispatcher=Dispatcher(self.config,self.addressee_kind,self.dispatch_error)
+        pairs=[(msg_type,name) for msg_type in vars(message_type).values() for name in instruction.all]
+        self.in_names={pair:'in.{}.{}'.format(*pair) for pair in pairs}
+        self.out_names={pair:'out.{}.{}'.format(*pair) for pair in pairs}
+        self.dispatcher.register(message_type.transmit,instruction.text,self.handle_transmit)
+        self.dispatcher.register(message_type.transmit,instruction.file,self.handle_transmit)
+        self.dispatcher.register(message_type.detection,instruction.detect,self.handle_detect,'server')
+        self.dispatcher.register(message_type.inquire,instruction.bye,self.handle_forward)
+        self.dispatcher.register(message_type.inquire,instruction.join,self.handle_join,'server')
+        self.dispatcher.register(message_type.inquire,instruction.call,self.handle_call,'server')
+        self.dispatcher.register(message_type.inquire,instruction.group,self.handle_group,'server')
+        self.dispatcher.register(message_type.inquire,instruction.leave,self.handle_leave,'server')
+        self.dispatcher.reject(message_type.respond,self.config.error.WrongMessageType)
+        self.dispatcher.register(message_type.report,instruction.error,self.dispatcher.error(self.config.error.WrongAddressee),'server')
+        self.dispatcher.register(message_type.report,instruction.error,self.handle_forward)
+    def addressee_kind(self,message:Message)->str:
+        if message.addressee==self.config.server_id:
+            return 'server'
+        if message.addressee==self.config.broadcast_id:
+            return 'broadcast'
+        return 'client'
+    def dispatch_error(self,message:Message,error_type):
+        self.error_report(message.sender,error_type)
+    def handle(self,message:Message,connection:Connection):
+        if message is not None:
+            self.dispatcher.dispatch(message,connection)
+    def handle_transmit(self,message:Message,connection:Connection):
+        self.track(message,connection)
+        self.send(message)
+    def handle_forward(self,message:Message,connection:Connection):
+        self.send(message)
+    def handle_detect(self,message:Message,connection:Connection):
+        self.heartbeat_detection(connection.id)
+    def handle_join(self,message:Message,connection:Connection):
+        self.negotiate(connection,self.config.instruction.id,message.content,{'id':connection.id,'token':self.issue(connection)})
+    def handle_call(self,message:Message,connection:Connection):
+        token=message.content.get('token') if type(message.content)==dict else None
+        content={'id':connection.id} if self.rebind(connection,message.sender,token) else {'id':connection.id,'token':self.issue(connection)}
+        self.negotiate(connection,self.config.instruction.known,message.content,content)
+        self.replay(connection)
+    def handle_group(self,message:Message,connection:Connection):
+        if type(message.content)==str and message.content and self.join_group(message.content,connection.id):
+            self.send_respond(self.config.instruction.group,connection.id,message.content)
+        else:
+            self.error_report(connection.id,self.config.error.WrongAddressee)
+    def handle_leave(self,message:Message,connection:Connection):
+        if type(message.content)==str and message.content in connection.groups:
+            self.leave_group(message.content,connection.id)
+            self.send_respond(self.config.instruction.leave,connection.id,message.content)
+        else:
+            self.error_report(connection.id,self.config.error.WrongAddressee)
+    def issue(self,connection:Connection)->str:
+        token=secrets.token_urlsafe(24)
+        digest=hashlib.sha256(token.encode()).hexdigest()
+        self.tokens[connection.id]=digest
+        if self.store is not None:
+            self.store.remember(connection.id,digest)
+        return token
+    def expire(self,id:str):
+        if self.store is not None and self.store.pending(id):
+            self.departures.schedule(id,self.config.store_retention_age)
+            return
+        self.departures.cancel(id)
+        self.known_ids.discard(id)
+        if self.tokens.pop(id,None) is not None and self.store is not None:
+            self.store.forget(id)
+    def authentic(self,id,token)->bool:
+        digest=self.tokens.get(id)
+        return digest is not None and type(token)==str and hmac.compare_digest(digest,hashlib.sha256(token.encode()).hexdigest())
+    def rebind(self,connection:Connection,id,token)->bool:
+        if id==connection.id:
+            return True
+        if not self.authentic(id,token):
+            return False
+        groups=set(connection.groups)
+        stale=self.clients_dict.get(id)
+        if stale is not None:
+            groups|=stale.groups
+            self.disconnect(stale)
+        self.forget(connection)
+        if connection.id not in self.tokens:
+            self.expire(connection.id)
+        self.departures.cancel(id)
+        connection.id=id
+        self.clients_dict[id]=connection
+        self.address_dict[connection.address]=id
+        self.wheel.schedule(connection,self.config.idle_timeout)
+        for group_id in groups:
+            self.join_group(group_id,id)
+        return True
+    def replay(self,connection:Connection):
+        if self.store is None:
+            return
+        queued=0
+        for payload in self.store.replay(connection.id):
+            if self.clients_dict.get(connection.id) is not connection or not self.has_room(connection):
+                break
+            message=Message.decode(payload)
+            if message is not None:
+                self.queue(connection,Message.frame(connection.codec.encode(message)))
+            queued+=1
+        if queued:
+            self.store.ack(connection.id,queued)
+            if self.metrics.enabled:
+                self.metrics.count('replayed',queued)
+        if self.store.pending(connection.id) and self.clients_dict.get(connection.id) is connection:
+            self.replaying.add(connection)
+        else:
+            self.replaying.discard(connection)
+    def route(self,message:Message)->list[Connection]|None:
+        if message.addressee==self.config.broadcast_id:
+            sender=self.clients_dict.get(message.sender)
+            return [connection for connection in self.clients_dict.values() if connection is not sender]
+        connection=self.clients_dict.get(message.addressee)
+        if connection is not None:
+            return [connection]
+        members=self.groups_dict.get(message.addressee)
+        if members is not None:
+            return [self.clients_dict[id] for id in members if id!=message.sender]
+        return None
+    def send(self,message:Message):
+        if message is not None:
+            self.deliver(message,self.route(message))
+    def deliver(self,message:Message,connections:list[Connection]|None):
+        if connections is None:
+            if self.store is not None and message.addressee in self.known_ids:
+                self.store.append(message.addressee,message.encode())
+                if self.metrics.enabled:
+                    self.metrics.count('stored')
+                return
+            self.error_sending(message.sender)
+            return
+        if self.metrics.enabled:
+            self.metrics.count(self.out_names.get((message.type,message.instruction),'out.unknown'),len(connections))
+        shared=None
+        for connection in connections:
+            if connection in self.replaying and message.sender!=self.config.server_id:
+                self.store.append(connection.id,message.encode())
+                continue
+            if not self.admit(connection,not connection.codec.shared):
+                continue
+            if not connection.codec.shared:
+                frame=Message.frame(connection.codec.encode(message))
+            elif shared is None:
+                frame=shared=Message.frame(connection.codec.encode(message))
+            else:
+                frame=shared
+            self.queue(connection,frame)
     def error_sending(self,sender):
-        try:
+        if sender in self.clients_dict:
             self.error_report(sender,self.config.error.AddresseeNotExist)
-        except socket.error as error:
-            print(f'Error sending message to client {sender}:{error}')
-            del self.clients_dict[sender]
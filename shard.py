@@ -0,0 +1,129 @@
+import os
+import selectors
+import signal
+import socket
+import traceback
+from connection import Connection
+from file_transfer import FileTransfer
+from message import Message
+from server_socket import ServerSocket
+class ShardServer(ServerSocket):
+    reuse_port=True
+    def __init__(self,index:int,count:int,peers:dict[int,socket.socket]):
+        self.index=index
+        self.count=count
+        super().__init__()
+        self.peers:dict[int,Connection]={}
+        for peer,peer_socket in peers.items():
+            peer_socket.setblocking(False)
+            connection=Connection(peer_socket,None,f'shard{peer}',self.decoder())
+            self.peers[peer]=connection
+            self.selector.register(peer_socket,selectors.EVENT_READ,connection)
+        self.peer_ids={connection.id for connection in self.peers.values()}
+    def metrics_port(self)->int:
+        return self.config.metrics_port+self.index if self.config.metrics_port else 0
+    def store_dir(self)->str:
+        return os.path.join(super().store_dir(),f'shard{self.index}')
+    def allocate(self)->str:
+        id=self.current_give_id*self.count+self.index
+        self.current_give_id+=1
+        return 'id'+str(id)
+    def owner(self,id)->int|None:
+        if type(id)==str and id.startswith('id') and id[2:].isdigit():
+            return int(id[2:])%self.count
+        return None
+    def forward_remote(self,message:Message,frame:bytes|None=None)->bool:
+        if message.addressee==self.config.broadcast_id:
+            frame=frame or Message.frame(message.encode())
+            for peer in self.peers.values():
+                self.write(peer,frame)
+            return False
+        if message.addressee in self.clients_dict or message.addressee in self.groups_dict:
+            return False
+        owner=self.owner(message.addressee)
+        if owner is None or owner==self.index:
+            return False
+        self.write(self.peers[owner],frame or Message.frame(message.encode()))
+        return True
+    def admit(self,connection:Connection,stateful:bool)->bool:
+        return connection.id in self.peer_ids or super().admit(connection,stateful)
+    def send(self,message:Message):
+        if message is not None and not self.forward_remote(message):
+            super().send(message)
+    def relay(self,message:Message):
+        self.deliver(message,self.route(message))
+    def transfer(self,connection:Connection,payload:bytes):
+        header=connection.transfers.get(FileTransfer.transfer_of(payload))
+        if header is not None and connection.id not in self.peer_ids and self.forward_remote(header,Message.frame(payload)):
+            peer=self.peers[self.owner(header.addressee)]
+            if not self.has_room(peer):
+                self.pause(connection,peer)
+            return
+        super().transfer(connection,payload)
+    def pause(self,connection:Connection,target:Connection):
+        if connection.id not in self.peer_ids:
+            super().pause(connection,target)
+    def handle(self,message:Message,connection:Connection):
+        if connection.id in self.peer_ids:
+            if message is not None:
+                self.track(message,connection)
+                self.relay(message)
+            return
+        super().handle(message,connection)
+    def error_sending(self,sender):
+        owner=self.owner(sender)
+        if sender in self.clients_dict or owner is not None and owner!=self.index:
+            self.error_report(sender,self.config.error.AddresseeNotExist)
+    def close(self):
+        for connection in self.peers.values():
+            self.disconnect(connection)
+        super().close()
+class ShardedServer:
+    def __init__(self,count:int|None=None):
+        self.count=count if count else os.cpu_count()
+        self.pids:list[int]=[]
+        pairs={
+            (i,j):socket.socketpair(socket.AF_UNIX,socket.SOCK_STREAM)
+            for i in range(self.count)
+            for j in range(i+1,self.count)
+        }
+        for index in range(self.count):
+            pid=os.fork()
+            if pid==0:
+                peers={}
+                for (i,j),(left,right) in pairs.items():
+                    if i==index:
+                        peers[j]=left
+                        right.close()
+                    elif j==index:
+                        peers[i]=right
+                        left.close()
+                    else:
+                        left.close()
+                        right.close()
+                status=1
+                try:
+                    self.run(index,peers)
+                    status=0
+                except BaseException:
+                    traceback.print_exc()
+                finally:
+                    os._exit(status)
+            self.pids.append(pid)
+        for left,right in pairs.values():
+            left.close()
+            right.close()
+    def run(self,index:int,peers:dict[int,socket.socket]):
+        server=ShardServer(index,self.count,peers)
+        signal.signal(signal.SIGTERM,lambda signum,frame:server.close())
+        try:
+            while server.running:
+                server.poll()
+        except (OSError,ValueError):
+            pass
+    def stop(self):
+        for pid in self.pids:
+            os.kill(pid,signal.SIGTERM)
+    def wait(self):
+        for pid in self.pids:
+            os.waitpid(pid,0)
@@ -1,22 +1,79 @@
 import requests
+import urllib3
+import hashlib
+import http.cookiejar
+import os
 import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from response_cache import ResponseCache
+class RateLimiter:
+    def __init__(self,rate=0.0):
+        self.rate=rate
+        self.lock=threading.Lock()
+        self.next=time.monotonic()
+    def acquire(self):
+        if not self.rate:
+            return
+        with self.lock:
+            now=time.monotonic()
+            wait=self.next-now
+            self.next=max(now,self.next)+1/self.rate
+        if wait>0:
+            time.sleep(wait)
 class Spider:
-    def __init__(self,timeout=5,user_agents=None,proxies=None):
+    def __init__(self,timeout=5,user_agents=None,proxies=None,pool_size=10,rate=0.0,cache:ResponseCache|None=None):
         self.timeout=timeout
         self.running=True
         self.user_agents=user_agents if user_agents else []
         self.proxies=proxies if proxies else []
-    def spider(self,url,other,cookies=None,method='GET',return_bytes=False):
+        self.pool_size=pool_size
+        self.sessions:dict[tuple,requests.Session]={}
+        self.sessions_lock=threading.Lock()
+        self.limiter=RateLimiter(rate)
+        self.host_slots:dict[str,threading.Semaphore]={}
+        self.cache=cache
+    def session(self,proxy,host)->requests.Session:
+        key=(tuple(sorted(proxy.items())) if proxy else None,host)
+        with self.sessions_lock:
+            session=self.sessions.get(key)
+            if session is None:
+                session=requests.Session()
+                session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+                adapter=requests.adapters.HTTPAdapter(pool_connections=1,pool_maxsize=self.pool_size)
+                session.mount('http://',adapter)
+                session.mount('https://',adapter)
+                if proxy:
+                    session.proxies.update(proxy)
+                self.sessions[key]=session
+        return session
+    def host_slot(self,host,per_host)->threading.Semaphore:
+        with self.sessions_lock:
+            if host not in self.host_slots:
+                self.host_slots[host]=threading.Semaphore(per_host)
+            return self.host_slots[host]
+    def close(self):
+        with self.sessions_lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+    def request(self,url,other,cookies=None,method='GET',stream=False,extra_headers=None,user_agent=None,proxy=None)->requests.Response|None:
+        if user_agent is None and self.user_agents:
+            user_agent=random.choice(self.user_agents)
+        if proxy is None and self.proxies:
+            proxy=random.choice(self.proxies)
         headers={
-            'User-Agent':random.choice(self.user_agents) if self.user_agents else None,
-            'Cookie':random.choice(cookies) if cookies else None
+            'User-Agent':user_agent,
+            'Cookie':random.choice(cookies) if cookies else None,
+            **(extra_headers or {})
         }
-        proxy=random.choice(self.proxies) if self.proxies else None
         kwargs={
             'url':url,
-            'proxies':proxy,
             'headers':headers,
-            'timeout':self.timeout
+            'timeout':self.timeout,
+            'stream':stream
         }
         if method=='GET':
             kwargs['params']=other
@@ -24,14 +81,86 @@ class Spider:
             kwargs['data']=other
         else:
             raise ValueError(f'Unsupported method:{method}')
+        self.limiter.acquire()
         try:
-            response=requests.request(method,**kwargs)
+            response=self.session(proxy,urlsplit(url).netloc).request(method,**kwargs)
             response.raise_for_status()
         except requests.Timeout as e:
             print(f'Timeout Error:{e}')
+            return None
         except requests.exceptions.RequestException as e:
             print(f'Request failed:{e}')
+            return None
+        return response
+    def spider(self,url,other,cookies=None,method='GET',return_bytes=False,user_agent=None,proxy=None):
+        if self.cache is not None and method=='GET':
+            response=self.cached(url,other,cookies,user_agent,proxy)
+        else:
+            response=self.request(url,other,cookies,method,user_agent=user_agent,proxy=proxy)
+        if response is None:
+            return None
         if not return_bytes:
             return response.text
         else:
             return response.content
+    def cached(self,url,other,cookies=None,user_agent=None,proxy=None):
+        key=ResponseCache.key('GET',url,other)
+        entry=self.cache.get(key)
+        if entry is not None and entry.fresh(time.time()):
+            return entry
+        response=self.request(url,other,cookies,extra_headers=entry.validators() if entry is not None else None,user_agent=user_agent,proxy=proxy)
+        if response is None:
+            return None
+        if response.status_code==304 and entry is not None:
+            return self.cache.refresh(key,entry,response)
+        self.cache.put(key,response)
+        return response
+    @staticmethod
+    def chunks(response:requests.Response,chunk_size=65536,decompress=True,limit=None):
+        with response:
+            length=response.headers.get('Content-Length')
+            if limit is not None and length and length.isdigit() and int(length)>limit:
+                raise ValueError(f'Response exceeds the limit:{length}')
+            total=0
+            for chunk in response.iter_content(chunk_size) if decompress else response.raw.stream(chunk_size,decode_content=False):
+                total+=len(chunk)
+                if limit is not None and total>limit:
+                    raise ValueError(f'Response exceeds the limit:{limit}')
+                yield chunk
+    def stream(self,url,other=None,cookies=None,method='GET',chunk_size=65536,decompress=True,limit=None):
+        response=self.request(url,other,cookies,method,stream=True)
+        if response is not None:
+            yield from Spider.chunks(response,chunk_size,decompress,limit)
+    def download(self,url,sink,other=None,cookies=None,method='GET',chunk_size=65536,decompress=True,limit=None,hash_name='sha256')->dict|None:
+        response=self.request(url,other,cookies,method,stream=True)
+        if response is None:
+            return None
+        digest=hashlib.new(hash_name)
+        size=0
+        file=open(sink,'wb') if type(sink)==str else sink
+        try:
+            for chunk in Spider.chunks(response,chunk_size,decompress,limit):
+                digest.update(chunk)
+                file.write(chunk)
+                size+=len(chunk)
+        except (ValueError,OSError,requests.exceptions.RequestException,urllib3.exceptions.HTTPError) as e:
+            print(f'Download failed:{e}')
+            if type(sink)==str:
+                file.close()
+                os.remove(sink)
+            return None
+        finally:
+            if type(sink)==str and not file.closed:
+                file.close()
+        return {
+            'url':url,
+            'status':response.status_code,
+            'size':size,
+            hash_name:digest.hexdigest()
+        }
+    def spider_many(self,urls,other=None,cookies=None,method='GET',return_bytes=False,workers=16,per_host=4)->list:
+        def fetch(url):
+            with self.host_slot(urlsplit(url).netloc,per_host):
+                return self.spider(url,other,cookies,method,return_bytes)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(fetch,urls))
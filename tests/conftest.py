@@ -0,0 +1,8 @@
+import os
+import sys
+import pytest
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config_manager import ConfigManager
+@pytest.fixture
+def config():
+    return ConfigManager.snapshot()
@@ -0,0 +1,49 @@
+import pytest
+from codec import BinaryCodec,Codec,CompressedCodec,JsonCodec
+from message import Message
+def messages(config):
+    return [
+        Message(config.message_type.transmit,config.instruction.text,'id1','id2','hello'),
+        Message(config.message_type.transmit,config.instruction.text,'id1','id2','hello again'),
+        Message(config.message_type.inquire,config.instruction.join,'id3',config.server_id,{'codecs':['binary'],'n':[1,2.5,None]}),
+        Message('custom','/custom','id2','id1','ünïcode'),
+        Message(config.message_type.respond,config.instruction.id,config.server_id,'id3',{'id':'id3'})
+    ]
+def pair(name,compression,config):
+    def create():
+        codec=Codec.create(name,config)
+        return CompressedCodec(codec,config) if compression else codec
+    return create(),create()
+def fields(message):
+    return message.type,message.instruction,message.sender,message.addressee,message.content
+@pytest.mark.parametrize('name',['json','binary'])
+@pytest.mark.parametrize('compression',[False,True])
+def test_round_trip(config,name,compression):
+    encoder,decoder=pair(name,compression,config)
+    for message in messages(config)*3:
+        assert fields(decoder.decode(encoder.encode(message)))==fields(message)
+def test_binary_reuses_id_codes(config):
+    encoder,decoder=pair('binary',False,config)
+    message=messages(config)[0]
+    first=encoder.encode(message)
+    second=encoder.encode(message)
+    assert len(second)<len(first)
+    assert fields(decoder.decode(first))==fields(decoder.decode(second))==fields(message)
+def test_plain_json_is_accepted_by_every_codec(config):
+    message=messages(config)[0]
+    for decoder in pair('binary',True,config):
+        assert fields(decoder.decode(message.encode()))==fields(message)
+def test_shared_only_for_stateless_codecs(config):
+    assert JsonCodec.shared
+    assert not BinaryCodec.shared
+    assert not CompressedCodec.shared
+@pytest.mark.parametrize('name,compression',[('binary',False),('json',True)])
+def test_dropped_frame_desyncs_stateful_codec(config,name,compression):
+    encoder,decoder=pair(name,compression,config)
+    frames=[encoder.encode(message) for message in messages(config)]
+    decoded=[decoder.decode(frame) for frame in frames[1:]]
+    assert any(message is None or fields(message)!=fields(original) for message,original in zip(decoded,messages(config)[1:]))
+def test_negotiate_falls_back_to_json(config):
+    assert type(Codec.negotiate(['unknown','binary'],config))==BinaryCodec
+    assert type(Codec.negotiate('binary',config))==JsonCodec
+    assert type(Codec.negotiate(None,config))==JsonCodec
@@ -0,0 +1,23 @@
+import json
+import pytest
+from config import Config
+from config_manager import ConfigManager
+def load(**server):
+    with open(ConfigManager.config_file_path) as file:
+        data=json.load(file)
+    data['server'].update(server)
+    return Config.load(data)
+@pytest.mark.parametrize('policy',['drop','disconnect'])
+def test_slow_consumer_policies_load(policy):
+    assert load(slow_consumer_policy=policy).slow_consumer_policy==policy
+def test_unknown_slow_consumer_policy_is_rejected():
+    with pytest.raises(ValueError):
+        load(slow_consumer_policy='drop-newest')
+def test_sighup_keeps_snapshot_when_reload_fails(monkeypatch,tmp_path,capsys):
+    current=ConfigManager.snapshot()
+    broken=tmp_path/'config.json'
+    broken.write_text('{not json')
+    monkeypatch.setattr(ConfigManager,'config_file_path',str(broken))
+    ConfigManager.handle_signal(None,None)
+    assert ConfigManager.config is current
+    assert 'Error reloading configuration' in capsys.readouterr().out
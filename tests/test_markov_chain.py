@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from Markov_chain import Markov_chain
+def random_chain(states, degree, seed):
+    rng = np.random.default_rng(seed)
+    edges = []
+    for state in range(states):
+        targets = rng.choice(states, degree, replace=False)
+        weights = rng.random(degree) + 0.1
+        weights /= weights.sum()
+        weights[-1] = 1 - weights[:-1].sum()
+        edges += [(str(state), str(target), float(weight)) for target, weight in zip(targets, weights)]
+    return Markov_chain(edges)
+def test_predict_matches_dense_power():
+    chain = random_chain(30, 4, 1)
+    P = chain._dense()
+    for time in (1, 5, 29, 30, 31, 200):
+        expected = np.linalg.matrix_power(P, time)[chain._index['3']]
+        assert np.allclose(chain.predict('3', time), expected)
+        assert np.allclose(chain.predict('3', time, dense_limit=0), expected)
+def test_predict_batches():
+    chain = random_chain(40, 3, 2)
+    states = ['0', '7', '39']
+    batch = chain.predict(states, 12)
+    assert batch.shape == (3, 40)
+    for row, state in zip(batch, states):
+        assert np.allclose(row, chain.predict(state, 12))
+    start = np.full(40, 1 / 40)
+    assert np.allclose(chain.predict(start, 3), start @ np.linalg.matrix_power(chain._dense(), 3))
+def test_predict_rejects_bad_input():
+    chain = random_chain(5, 2, 3)
+    with pytest.raises(ValueError):
+        chain.predict('missing', 3)
+    with pytest.raises(ValueError):
+        chain.predict('0', 0)
+    with pytest.raises(ValueError):
+        chain.predict(np.ones(5), 3)
+def test_blocked_step_matches_rows():
+    chain = random_chain(50, 3, 4)
+    V = np.random.default_rng(5).random((37, 50))
+    expected = np.stack([row @ chain._dense() for row in V])
+    assert np.allclose(chain._step(V), expected)
+    assert np.allclose(chain._step(V, block_size=500), expected)
+    assert np.allclose(chain._step(V, block_size=1), expected)
+def test_stationary_distribution():
+    chain = random_chain(60, 5, 6)
+    pi = chain.stationary_distribution()
+    assert np.isclose(pi.sum(), 1)
+    assert np.allclose(pi @ chain._dense(), pi, atol=1e-9)
+def test_stationary_distribution_of_periodic_chain():
+    chain = Markov_chain([('a', 'b', 1.0), ('b', 'a', 1.0)])
+    assert np.allclose(chain.stationary_distribution(), [0.5, 0.5])
+    assert np.allclose(chain.stationary_distribution(start='a'), [0.5, 0.5])
+def squarings(monkeypatch):
+    calls = []
+    matrix_power = np.linalg.matrix_power
+    def counted(P, time):
+        calls.append(time)
+        return matrix_power(P, time)
+    monkeypatch.setattr(np.linalg, 'matrix_power', counted)
+    return calls
+def test_predict_steps_sparse_chains(monkeypatch):
+    chain = random_chain(300, 4, 7)
+    calls = squarings(monkeypatch)
+    expected = chain.predict('3', 301, dense_limit=0)
+    assert np.allclose(chain.predict('3', 301), expected)
+    assert calls == []
+def test_predict_squares_dense_chains(monkeypatch):
+    chain = random_chain(20, 20, 8)
+    calls = squarings(monkeypatch)
+    expected = chain.predict('3', 5000, dense_limit=0)
+    assert np.allclose(chain.predict('3', 5000), expected)
+    assert calls == [5000]
+def test_predict_accepts_list_of_vectors():
+    chain = random_chain(10, 3, 9)
+    vectors = [np.eye(10)[0], np.full(10, 0.1)]
+    assert np.allclose(chain.predict(vectors, 4), chain.predict(np.array(vectors), 4))
+    with pytest.raises(ValueError):
+        chain.predict([np.eye(10)[0], '3'], 4)
+    with pytest.raises(ValueError):
+        chain.predict([np.eye(10)[0], np.eye(9)[0]], 4)
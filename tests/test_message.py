@@ -0,0 +1,48 @@
+import random
+import socket
+import pytest
+from message import HEADER,FrameDecoder,Message
+def payloads():
+    return [b'',b'x',Message('transmit','/text:','id1','id2','hello').encode(),bytes(range(256))*300]
+def test_feed_reassembles_frames_split_at_every_byte():
+    data=b''.join(Message.frame(payload) for payload in payloads())
+    decoder=FrameDecoder(16,1<<20)
+    frames=[]
+    for index in range(len(data)):
+        frames+=decoder.feed(data[index:index+1])
+    assert frames==payloads()
+    assert not decoder.buffer
+def test_feed_reassembles_random_chunks():
+    data=b''.join(Message.frame(payload) for payload in payloads()*20)
+    rng=random.Random(7)
+    decoder=FrameDecoder(16,1<<20)
+    frames=[]
+    offset=0
+    while offset<len(data):
+        size=rng.randint(1,5000)
+        frames+=decoder.feed(memoryview(data)[offset:offset+size])
+        offset+=size
+    assert frames==payloads()*20
+def test_feed_keeps_partial_header():
+    decoder=FrameDecoder(16,1<<20)
+    frame=Message.frame(b'abc')
+    assert decoder.feed(frame[:2])==[]
+    assert decoder.feed(frame[2:5])==[]
+    assert decoder.feed(frame[5:]+frame)==[b'abc',b'abc']
+def test_feed_rejects_oversized_frame():
+    decoder=FrameDecoder(16,1024)
+    with pytest.raises(ValueError):
+        decoder.feed(HEADER.pack(1025)+b'x')
+def test_recv_frames_partial_and_closed():
+    left,right=socket.socketpair()
+    try:
+        decoder=FrameDecoder(65536,1<<20)
+        frame=Message.frame(b'payload')
+        left.sendall(frame[:6])
+        assert decoder.recv_frames(right)==[]
+        left.sendall(frame[6:])
+        assert decoder.recv_frames(right)==[b'payload']
+        left.close()
+        assert decoder.recv_frames(right) is None
+    finally:
+        right.close()
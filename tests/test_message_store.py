@@ -0,0 +1,75 @@
+import time
+from message_store import MessageStore
+def open_store(directory,**changes):
+    options=dict(segment_size=4096,sync_interval=1.0,sync_batch=100,retention_bytes=1<<30,retention_age=3600.0)
+    options.update(changes)
+    return MessageStore(str(directory),**options)
+def test_append_and_replay_in_order(tmp_path):
+    store=open_store(tmp_path)
+    for number in range(300):
+        store.append('id1',f'a{number}'.encode())
+    store.append('id2',b'b')
+    assert list(store.replay('id1'))==[f'a{number}'.encode() for number in range(300)]
+    assert list(store.replay('id2'))==[b'b']
+    assert list(store.replay('id3'))==[]
+    assert store.addressees()=={'id1','id2'}
+    assert len(store.segments)>1
+    store.close()
+def test_partial_ack_survives_reload(tmp_path):
+    store=open_store(tmp_path)
+    for number in range(10):
+        store.append('id1',str(number).encode())
+    store.ack('id1',4)
+    assert store.pending('id1')==6
+    store.append('id1',b'10')
+    store.close()
+    store=open_store(tmp_path)
+    assert list(store.replay('id1'))==[str(number).encode() for number in range(4,11)]
+    store.ack('id1')
+    assert store.pending('id1')==0
+    store.close()
+    store=open_store(tmp_path)
+    assert 'id1' not in store.addressees()
+    store.close()
+def test_ack_after_reload_keeps_later_messages(tmp_path):
+    store=open_store(tmp_path)
+    for number in range(3):
+        store.append('id1',str(number).encode())
+    store.close()
+    store=open_store(tmp_path)
+    store.ack('id1',2)
+    store.append('id1',b'3')
+    store.close()
+    store=open_store(tmp_path)
+    assert list(store.replay('id1'))==[b'2',b'3']
+    store.close()
+def test_tokens_are_remembered(tmp_path):
+    store=open_store(tmp_path)
+    store.remember('id1','old')
+    store.remember('id1','new')
+    store.remember('id2','other')
+    store.close()
+    store=open_store(tmp_path)
+    assert store.tokens=={'id1':'new','id2':'other'}
+    store.close()
+def test_forgotten_tokens_stay_forgotten(tmp_path):
+    store=open_store(tmp_path)
+    store.remember('id1','token')
+    store.remember('id2','other')
+    store.forget('id1')
+    store.close()
+    store=open_store(tmp_path)
+    assert store.tokens=={'id2':'other'}
+    store.close()
+def test_expire_drops_old_segments(tmp_path):
+    store=open_store(tmp_path,retention_bytes=3*4096)
+    for number in range(200):
+        store.append('id1',bytes(100))
+    store.expire(time.time())
+    assert sum(segment.size for segment in store.segments)<=3*4096
+    assert 0<store.pending('id1')<200
+    store.append('id2',b'last')
+    store.expire(time.time()+7200)
+    assert len(store.segments)==1
+    assert list(store.replay('id2'))==[b'last']
+    store.close()
@@ -0,0 +1,147 @@
+import dataclasses
+import os
+import selectors
+import socket
+import time
+import pytest
+from codec import Codec
+from config import SLOW_CONSUMER_POLICIES
+from file_transfer import CHUNK,MAGIC
+from message import HEADER,FrameDecoder,Message
+from server_socket import ServerSocket
+@pytest.fixture
+def make_server(config):
+    servers=[]
+    def make(**changes):
+        settings=dict(host='127.0.0.1',port=0,metrics_enabled=False,store_enabled=False,select_timeout=0.01)
+        settings.update(changes)
+        server=ServerSocket(dataclasses.replace(config,**settings))
+        servers.append(server)
+        return server
+    yield make
+    for server in servers:
+        server.close()
+def pump(server,client,decoder):
+    server.poll()
+    try:
+        return decoder.recv_frames(client)
+    except BlockingIOError:
+        return []
+    except ConnectionError:
+        return None
+def join(server,offer):
+    client=socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+    client.setsockopt(socket.SOL_SOCKET,socket.SO_RCVBUF,4096)
+    client.connect(server.socket.getsockname())
+    client.setblocking(False)
+    client.sendall(Message.frame(Message(server.config.message_type.inquire,server.config.instruction.join,'',server.config.server_id,offer).encode()))
+    decoder=FrameDecoder(65536,1<<24)
+    deadline=time.monotonic()+5
+    frames=[]
+    while not frames:
+        assert time.monotonic()<deadline
+        frames=pump(server,client,decoder)
+    response=Codec.create('json',server.config).decode(frames[0])
+    connection=server.clients_dict[response.content['id']]
+    connection.socket.setsockopt(socket.SOL_SOCKET,socket.SO_SNDBUF,4096)
+    return client,decoder,connection,Codec.compressed(Codec.create(response.content['codec'],server.config),response.content.get('compression'),server.config)
+def drain(server,client,decoder,connection):
+    frames=[]
+    idle=0
+    while idle<20:
+        received=pump(server,client,decoder)
+        if received is None:
+            break
+        frames+=received
+        idle=0 if received or connection.outbox else idle+1
+    client.close()
+    return frames
+@pytest.mark.parametrize('policy',SLOW_CONSUMER_POLICIES)
+@pytest.mark.parametrize('codecs,compression',[(['json'],None),(['binary'],None),(['json'],'zlib'),(['binary'],'zlib')])
+def test_slow_consumer_never_desyncs(make_server,policy,codecs,compression):
+    server=make_server(slow_consumer_policy=policy,slow_consumer_grace=0.0,outbox_bytes_limit=50000,compression_enabled=True)
+    offer={'codecs':codecs}
+    if compression:
+        offer['compression']=compression
+    client,decoder,connection,codec=join(server,offer)
+    stateful=not connection.codec.shared
+    text=server.config.instruction.text
+    for number in range(400):
+        if server.clients_dict.get(connection.id) is not connection:
+            break
+        server.deliver(Message(server.config.message_type.transmit,text,'id0',connection.id,{'n':number,'t':os.urandom(1000).hex()}),[connection])
+    evicted=server.clients_dict.get(connection.id) is not connection
+    numbers=[]
+    for frame in drain(server,client,decoder,connection):
+        message=codec.decode(frame)
+        assert message is not None
+        numbers.append(message.content['n'])
+    assert numbers==sorted(numbers)
+    assert evicted or connection.dropped
+    if stateful or policy=='disconnect':
+        assert connection.dropped==0
+        assert numbers==list(range(len(numbers)))
+def test_file_chunks_pause_sender_instead_of_evicting(make_server):
+    server=make_server(slow_consumer_grace=0.0,outbox_bytes_limit=50000)
+    sender,_,sending,_=join(server,{'codecs':['json']})
+    receiver,decoder,receiving,_=join(server,{'codecs':['json']})
+    chunks=[Message.frame(CHUNK.pack(MAGIC,7,number*4000,0)+os.urandom(4000)) for number in range(300)]
+    header=Message(server.config.message_type.transmit,server.config.instruction.file,sending.id,receiving.id,{'transfer':7,'filename':'f','size':300*4000,'offset':0})
+    data=memoryview(Message.frame(header.encode())+b''.join(chunks))
+    frames=[]
+    paused=False
+    deadline=time.monotonic()+10
+    while data or len(frames)<301:
+        assert time.monotonic()<deadline
+        try:
+            data=data[sender.send(data):]
+        except BlockingIOError:
+            pass
+        server.poll()
+        if sending.blocked_by:
+            paused=True
+            assert server.selector.get_map().get(sending.socket) is None or not server.selector.get_key(sending.socket).events&selectors.EVENT_READ
+        if paused:
+            frames+=pump(server,receiver,decoder) or []
+    assert server.clients_dict.get(receiving.id) is receiving
+    assert not sending.blocked_by and not receiving.waiting
+    assert frames[1:]==[chunk[HEADER.size:] for chunk in chunks]
+    sender.close()
+    receiver.close()
+def test_groups_cannot_take_client_ids(make_server):
+    server=make_server()
+    first,_,connection,_=join(server,{'codecs':['json']})
+    assert not server.join_group('id9',connection.id)
+    assert not server.join_group(connection.id,connection.id)
+    assert not server.join_group(server.config.broadcast_id,connection.id)
+    assert server.join_group('room',connection.id)
+    assert server.route(Message(server.config.message_type.transmit,server.config.instruction.text,'x','room','hi'))==[connection]
+    first.close()
+def test_departed_ids_expire_after_retention(make_server):
+    server=make_server(store_retention_age=0.05,wheel_tick=0.01)
+    client,_,connection,_=join(server,{'codecs':['json']})
+    assert connection.id in server.tokens and connection.id in server.known_ids
+    client.close()
+    deadline=time.monotonic()+5
+    while connection.id in server.known_ids or connection.id in server.tokens:
+        assert time.monotonic()<deadline
+        server.poll()
+    assert not server.departures.deadlines
+def test_departed_ids_with_a_backlog_are_kept(make_server,tmp_path):
+    server=make_server(store_enabled=True,store_dir=str(tmp_path),store_retention_age=0.05,wheel_tick=0.01)
+    client,_,connection,_=join(server,{'codecs':['json']})
+    client.close()
+    deadline=time.monotonic()+5
+    while connection.id in server.clients_dict:
+        assert time.monotonic()<deadline
+        server.poll()
+    server.send(Message(server.config.message_type.transmit,server.config.instruction.text,'x',connection.id,'later'))
+    assert server.store.pending(connection.id)==1
+    for _ in range(20):
+        server.poll()
+    assert connection.id in server.known_ids and connection.id in server.tokens
+    server.store.ack(connection.id)
+    while connection.id in server.known_ids or connection.id in server.tokens:
+        assert time.monotonic()<deadline
+        server.poll()
+    assert connection.id not in server.store.tokens
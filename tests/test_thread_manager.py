@@ -0,0 +1,38 @@
+import dataclasses
+import threading
+import time
+from client import Client
+from config_manager import ConfigManager
+from server_socket import ServerSocket
+from thread_manager import ThreadManager
+class Looping:
+    def __init__(self):
+        self.running=True
+    def close(self):
+        self.running=False
+def test_stop_threads_uses_one_deadline():
+    release=threading.Event()
+    manager=ThreadManager(Looping())
+    manager.start_threads(release.wait,release.wait,release.wait)
+    start=time.monotonic()
+    alive=manager.stop_threads(0.3)
+    elapsed=time.monotonic()-start
+    release.set()
+    assert len(alive)==3
+    assert elapsed<0.6
+    for thread in alive:
+        thread.join(1)
+def test_stop_threads_wakes_a_blocked_client(config,monkeypatch):
+    server=ServerSocket(dataclasses.replace(config,host='127.0.0.1',port=0,select_timeout=0.05,store_enabled=False,metrics_enabled=False))
+    monkeypatch.setattr(ConfigManager,'config',dataclasses.replace(server.config,port=server.socket.getsockname()[1],heartbeat_rate=30))
+    server_threads=ThreadManager(server)
+    server_threads.start_threads(server.poll)
+    client=Client()
+    deadline=time.monotonic()+5
+    while not server.clients_dict:
+        assert time.monotonic()<deadline
+        time.sleep(0.01)
+    start=time.monotonic()
+    assert client.thread.stop_threads(3)==[]
+    assert server_threads.stop_threads(3)==[]
+    assert time.monotonic()-start<1
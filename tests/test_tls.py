@@ -0,0 +1,63 @@
+import dataclasses
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+import pytest
+from tls import Tls
+pytestmark=pytest.mark.skipif(shutil.which('openssl') is None,reason='openssl is not installed')
+def openssl(*args):
+    subprocess.run(['openssl',*args],check=True,capture_output=True)
+@pytest.fixture(scope='module')
+def certificates(tmp_path_factory):
+    directory=tmp_path_factory.mktemp('tls')
+    path=lambda name:str(directory/name)
+    openssl('req','-x509','-newkey','rsa:2048','-nodes','-keyout',path('ca.key'),'-out',path('ca.pem'),'-days','1','-subj','/CN=test-ca')
+    (directory/'san.ext').write_text('subjectAltName=DNS:localhost\n')
+    for name in ('server','client'):
+        openssl('req','-newkey','rsa:2048','-nodes','-keyout',path(name+'.key'),'-out',path(name+'.csr'),'-subj','/CN=localhost')
+        openssl('x509','-req','-in',path(name+'.csr'),'-CA',path('ca.pem'),'-CAkey',path('ca.key'),'-CAcreateserial','-out',path(name+'.pem'),'-days','1','-extfile',path('san.ext'))
+    return path
+def tls_config(config,path,**changes):
+    settings=dict(
+        tls_enabled=True,
+        tls_certfile=path('server.pem'),
+        tls_keyfile=path('server.key'),
+        tls_cafile=path('ca.pem'),
+        tls_verify=True,
+        tls_require_client_cert=False,
+        tls_client_certfile='',
+        tls_client_keyfile='',
+        tls_server_hostname='localhost'
+    )
+    settings.update(changes)
+    return dataclasses.replace(config,**settings)
+def exchange(config)->bool:
+    listener=socket.create_server(('127.0.0.1',0))
+    def serve():
+        connection,_=listener.accept()
+        try:
+            with Tls.server_context(config).wrap_socket(connection,server_side=True) as server:
+                server.sendall(server.recv(4))
+        except (ssl.SSLError,OSError):
+            pass
+    thread=threading.Thread(target=serve)
+    thread.start()
+    try:
+        with Tls.client_context(config).wrap_socket(socket.create_connection(listener.getsockname()),server_hostname=Tls.server_hostname(config)) as client:
+            client.sendall(b'ping')
+            return client.recv(4)==b'ping'
+    except (ssl.SSLError,OSError):
+        return False
+    finally:
+        thread.join(5)
+        listener.close()
+def test_verify_with_private_ca_does_not_require_client_certificate(config,certificates):
+    assert exchange(tls_config(config,certificates))
+def test_mutual_tls_with_client_certificate(config,certificates):
+    assert exchange(tls_config(config,certificates,tls_require_client_cert=True,tls_client_certfile=certificates('client.pem'),tls_client_keyfile=certificates('client.key')))
+def test_mutual_tls_rejects_client_without_certificate(config,certificates):
+    assert not exchange(tls_config(config,certificates,tls_require_client_cert=True))
+def test_client_verifies_server(config,certificates):
+    assert not exchange(tls_config(config,certificates,tls_server_hostname='example.org'))
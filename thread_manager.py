@@ -1,17 +1,81 @@
+import queue
 import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
 class ThreadManager:
-    def __init__(self,the_socket):
+    def __init__(self,the_socket,workers:int=4,queue_limit:int=1024,restart_limit:int=3,backoff:float=0.01,backoff_limit:float=1.0):
         self.socket=the_socket
+        self.workers=workers
+        self.restart_limit=restart_limit
+        self.backoff=backoff
+        self.backoff_limit=backoff_limit
+        self.tasks:queue.Queue[tuple[Future,Callable,tuple]|None]=queue.Queue(queue_limit)
+        self.threads:list[threading.Thread]=[]
+        self.pool:list[threading.Thread]=[]
+        self.errors:list[tuple[Callable,BaseException]]=[]
+        self.stopping=threading.Event()
+        self.lock=threading.Lock()
+    def running(self)->bool:
+        return self.socket.running and not self.stopping.is_set()
+    def capture(self,callback:Callable,error:BaseException):
+        self.errors.append((callback,error))
+        print(f'An error occurs:{error}')
     def loop(self,callback):
-        while True:
-            if not self.socket.running:
-                break
-            callback()
+        failures=0
+        while self.running():
+            try:
+                callback()
+                failures=0
+            except Exception as error:
+                self.capture(callback,error)
+                failures+=1
+                if failures>self.restart_limit:
+                    name=getattr(callback,'__qualname__',repr(callback))
+                    print(f'Stopped {name} after {failures} consecutive failures')
+                    break
+                self.stopping.wait(min(self.backoff*2**failures,self.backoff_limit))
+    def spawn(self,target:Callable,*args,daemon:bool=False)->threading.Thread:
+        thread=threading.Thread(target=target,args=args,daemon=daemon)
+        thread.start()
+        return thread
     def start_threads(self,*callbacks):
         try:
             for callback in callbacks:
-                threading.Thread(target=self.loop,args=(callback,)).start()
+                self.threads.append(self.spawn(self.loop,callback))
         except Exception as error:
             print(f'An error occurs:{error}')
-    def stop_threads(self):
-        self.socket.running=False
+    def work(self):
+        while True:
+            task=self.tasks.get()
+            if task is None:
+                break
+            future,callback,args=task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(callback(*args))
+            except Exception as error:
+                self.capture(callback,error)
+                future.set_exception(error)
+    def submit(self,callback:Callable,*args)->Future:
+        if self.stopping.is_set():
+            raise RuntimeError('cannot submit after stop_threads')
+        with self.lock:
+            if len(self.pool)<self.workers:
+                self.pool.append(self.spawn(self.work,daemon=True))
+        future=Future()
+        self.tasks.put((future,callback,args))
+        return future
+    def stop_threads(self,timeout:float|None=None)->list[threading.Thread]:
+        self.stopping.set()
+        with self.lock:
+            for _ in self.pool:
+                self.tasks.put(None)
+        self.socket.close()
+        deadline=None if timeout is None else time.monotonic()+timeout
+        current=threading.current_thread()
+        for thread in self.threads+self.pool:
+            if thread is not current:
+                thread.join(None if deadline is None else max(deadline-time.monotonic(),0.0))
+        return [thread for thread in self.threads+self.pool if thread.is_alive()]
@@ -0,0 +1,29 @@
+import math
+import time
+class TimerWheel:
+    def __init__(self,slots:int,tick:float):
+        self.slots:list[set]=[set() for _ in range(slots)]
+        self.tick=tick
+        self.started=time.monotonic()
+        self.current=0
+        self.deadlines:dict[object,int]={}
+    def schedule(self,item,delay:float):
+        self.cancel(item)
+        deadline=self.current+max(1,math.ceil(delay/self.tick))
+        self.deadlines[item]=deadline
+        self.slots[deadline%len(self.slots)].add(item)
+    def cancel(self,item):
+        deadline=self.deadlines.pop(item,None)
+        if deadline is not None:
+            self.slots[deadline%len(self.slots)].discard(item)
+    def advance(self,now:float|None=None)->list:
+        target=int(((time.monotonic() if now is None else now)-self.started)/self.tick)
+        expired=[]
+        while self.current<target:
+            self.current+=1
+            slot=self.slots[self.current%len(self.slots)]
+            for item in [item for item in slot if self.deadlines[item]<=self.current]:
+                slot.discard(item)
+                del self.deadlines[item]
+                expired.append(item)
+        return expired
@@ -0,0 +1,30 @@
+import ssl
+from config import Config
+class Tls:
+    @staticmethod
+    def server_context(config:Config)->ssl.SSLContext|None:
+        if not config.tls_enabled:
+            return None
+        context=ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(config.tls_certfile,config.tls_keyfile or None)
+        if config.tls_require_client_cert:
+            if config.tls_cafile:
+                context.load_verify_locations(config.tls_cafile)
+            else:
+                context.load_default_certs(ssl.Purpose.CLIENT_AUTH)
+            context.verify_mode=ssl.CERT_REQUIRED
+        return context
+    @staticmethod
+    def client_context(config:Config)->ssl.SSLContext|None:
+        if not config.tls_enabled:
+            return None
+        context=ssl.create_default_context(cafile=config.tls_cafile or None)
+        if not config.tls_verify:
+            context.check_hostname=False
+            context.verify_mode=ssl.CERT_NONE
+        if config.tls_client_certfile:
+            context.load_cert_chain(config.tls_client_certfile,config.tls_client_keyfile or None)
+        return context
+    @staticmethod
+    def server_hostname(config:Config)->str:
+        return config.tls_server_hostname or config.host